@@ -1,29 +1,92 @@
 import os
+from functools import lru_cache
+from typing import Optional
 
 import stripe
 from dotenv import load_dotenv
+from pydantic import BaseModel, ConfigDict
 
-load_dotenv()  # Load variables from .env file into environment
+
+class Settings(BaseModel):
+    """
+    Application settings, read from the environment once per process
+    """
+
+    # App environment variables
+    database_url: str = ""
+    web_url: str = "*"
+    env: str = "dev"
+    forwarded_allow_ips: str = "127.0.0.1"
+
+    # Stripe environment variables
+    stripe_secret_key: Optional[str] = None
+    stripe_webhook_secret: Optional[str] = None
+
+    # Firebase environment variables
+    firebase_type: Optional[str] = None
+    firebase_project_id: Optional[str] = None
+    firebase_private_key_id: Optional[str] = None
+    firebase_private_key: str = ""
+    firebase_client_email: Optional[str] = None
+    firebase_client_id: Optional[str] = None
+    firebase_auth_uri: Optional[str] = None
+    firebase_token_uri: Optional[str] = None
+    firebase_auth_provider_cert_url: Optional[str] = None
+    firebase_client_cert_url: Optional[str] = None
+
+    model_config = ConfigDict(frozen=True)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Loads the .env file and builds the settings on first call only.
+    """
+    load_dotenv()  # Load variables from .env file into environment
+
+    return Settings(
+        database_url=os.getenv("DATABASE_URL", ""),
+        web_url=os.getenv("WEB_URL", "*"),
+        env=os.getenv("ENV", "dev"),
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        stripe_secret_key=os.getenv("STRIPE_SECRET_KEY"),
+        stripe_webhook_secret=os.getenv("STRIPE_WEBHOOK_SECRET"),
+        firebase_type=os.getenv("FIREBASE_TYPE"),
+        firebase_project_id=os.getenv("FIREBASE_PROJECT_ID"),
+        firebase_private_key_id=os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        firebase_private_key=os.getenv("FIREBASE_PRIVATE_KEY", "").replace(
+            "\\n", "\n"
+        ),
+        firebase_client_email=os.getenv("FIREBASE_CLIENT_EMAIL"),
+        firebase_client_id=os.getenv("FIREBASE_CLIENT_ID"),
+        firebase_auth_uri=os.getenv("FIREBASE_AUTH_URI"),
+        firebase_token_uri=os.getenv("FIREBASE_TOKEN_URI"),
+        firebase_auth_provider_cert_url=os.getenv("FIREBASE_AUTH_PROVIDER_CERT_URL"),
+        firebase_client_cert_url=os.getenv("FIREBASE_CLIENT_CERT_URL"),
+    )
+
+
+settings = get_settings()
 
 # Set up Stripe API key
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+stripe.api_key = settings.stripe_secret_key
 
 # App environment variables
-DATABASE_URL = os.getenv("DATABASE_URL", "")
-WEB_URL = os.getenv("WEB_URL", "*")
-ENV = os.getenv("ENV", "dev")
+DATABASE_URL = settings.database_url
+WEB_URL = settings.web_url
+ENV = settings.env
 
 # Stripe environment variables
-STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+STRIPE_WEBHOOK_SECRET = settings.stripe_webhook_secret
 
 # Firebase environment variables
-FIREBASE_TYPE = os.getenv("FIREBASE_TYPE")
-FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
-FIREBASE_PRIVATE_KEY_ID = os.getenv("FIREBASE_PRIVATE_KEY_ID")
-FIREBASE_PRIVATE_KEY = os.getenv("FIREBASE_PRIVATE_KEY", "").replace("\\n", "\n")
-FIREBASE_CLIENT_EMAIL = os.getenv("FIREBASE_CLIENT_EMAIL")
-FIREBASE_CLIENT_ID = os.getenv("FIREBASE_CLIENT_ID")
-FIREBASE_AUTH_URI = os.getenv("FIREBASE_AUTH_URI")
-FIREBASE_TOKEN_URI = os.getenv("FIREBASE_TOKEN_URI")
-FIREBASE_AUTH_PROVIDER_CERT_URL = os.getenv("FIREBASE_AUTH_PROVIDER_CERT_URL")
-FIREBASE_CLIENT_CERT_URL = os.getenv("FIREBASE_CLIENT_CERT_URL")
+FIREBASE_TYPE = settings.firebase_type
+FIREBASE_PROJECT_ID = settings.firebase_project_id
+FIREBASE_PRIVATE_KEY_ID = settings.firebase_private_key_id
+FIREBASE_PRIVATE_KEY = settings.firebase_private_key
+FIREBASE_CLIENT_EMAIL = settings.firebase_client_email
+FIREBASE_CLIENT_ID = settings.firebase_client_id
+FIREBASE_AUTH_URI = settings.firebase_auth_uri
+FIREBASE_TOKEN_URI = settings.firebase_token_uri
+FIREBASE_AUTH_PROVIDER_CERT_URL = settings.firebase_auth_provider_cert_url
+FIREBASE_CLIENT_CERT_URL = settings.firebase_client_cert_url
@@ -1,10 +1,27 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 from app.core.config import DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+# Keep warm connections to Postgres; in-memory SQLite (tests) shares one connection
+if DATABASE_URL.startswith("sqlite"):
+    pool_options = (
+        {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        if DATABASE_URL in ("sqlite://", "sqlite:///:memory:")
+        else {}
+    )
+else:
+    pool_options = {
+        "poolclass": QueuePool,
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    }
+
+engine = create_engine(DATABASE_URL, **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -1,5 +1,7 @@
 from datetime import date
 
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.core.test_data import test_notes, test_tasks
@@ -28,14 +30,13 @@ def init_test_data(db: Session, reset: bool = False):
         db.commit()
         print("✅ Inserted default test user")
 
-    for task_data in test_tasks:
-        task = Task(**task_data)
-        db.merge(task)
+    db.execute(insert(Task), test_tasks)
     print("✅ Inserted test tasks")
 
-    for note_data in test_notes:
-        note = Note(**note_data)
-        db.merge(note)
+    db.execute(
+        pg_insert(Note).on_conflict_do_nothing(index_elements=["user_id", "date"]),
+        test_notes,
+    )
     print("✅ Inserted test notes")
 
     db.commit()
@@ -1,17 +1,23 @@
 from datetime import datetime
+from threading import Lock
+from typing import Optional
 
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from firebase_admin import auth as firebase_auth
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.models.user import User
-from app.services.firebase_admin import firebase_auth
+from app.services.firebase_admin import verify_id_token_cached
 
 # Use HTTPBearer to extract the token from the Authorization header.
 security = HTTPBearer()
 
+# Firebase UID to user ID, so repeat requests load the user by primary key
+_user_id_cache: TTLCache = TTLCache(maxsize=50_000, ttl=900)
+_user_id_cache_lock = Lock()
+
 
 def get_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -21,21 +27,10 @@ def get_user(
     Retrieves the user from the Firebase token.
     """
     # Verify the token using Firebase Admin SDK
-    token = credentials.credentials
-
-    try:
-        decoded_token = firebase_auth.verify_id_token(token)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token"
-        )
-
-    firebase_uid = decoded_token.get("uid")
-    name = decoded_token.get("name")
-    email = decoded_token.get("email")
+    decoded_token = get_token(credentials)
 
     # Check if the user exists by Firebase UID
-    user = db.query(User).filter(User.firebase_uid == firebase_uid).first()
+    user = find_user_by_firebase_uid(db, decoded_token.get("uid"))
     if user:
         return user
     else:
@@ -44,6 +39,34 @@ def get_user(
         )
 
 
+def find_user_by_firebase_uid(db: Session, firebase_uid: str) -> Optional[User]:
+    """
+    Finds a user by Firebase UID, loading by primary key once the UID is known.
+    """
+    # Load the user by primary key if the UID has been resolved before
+    with _user_id_cache_lock:
+        user_id = _user_id_cache.get(firebase_uid)
+    if user_id is not None:
+        user = db.get(User, user_id)
+        if user and user.firebase_uid == firebase_uid:
+            return user
+        with _user_id_cache_lock:
+            _user_id_cache.pop(firebase_uid, None)
+
+    user = db.query(User).filter(User.firebase_uid == firebase_uid).first()
+    if user:
+        remember_user_id(user)
+    return user
+
+
+def remember_user_id(user: User) -> None:
+    """
+    Records the user's primary key for later lookups by Firebase UID.
+    """
+    with _user_id_cache_lock:
+        _user_id_cache[user.firebase_uid] = user.id
+
+
 def get_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
@@ -54,7 +77,7 @@ def get_token(
     token = credentials.credentials
 
     try:
-        decoded_token = firebase_auth.verify_id_token(token)
+        decoded_token = verify_id_token_cached(token)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token"
@@ -63,16 +86,20 @@ def get_token(
     return decoded_token
 
 
-def get_subscribed_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-) -> User:
+def require_admin(decoded_token: dict = Depends(get_token)) -> None:
     """
-    Retrieves the user from the Firebase token and checks if they are subscribed.
+    Checks the Firebase token carries the admin custom claim.
     """
-    # Verify the token using Firebase Admin SDK
-    user = get_user(credentials, db)
+    if decoded_token.get("admin") is not True:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
 
+
+def get_subscribed_user(user: User = Depends(get_user)) -> User:
+    """
+    Retrieves the user from the Firebase token and checks if they are subscribed.
+    """
     # Check if the user is subscribed
     if user.is_subscribed is True:
         return user
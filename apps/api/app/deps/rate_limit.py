@@ -0,0 +1,92 @@
+import time
+from threading import Lock
+
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, Request, status
+
+from app.deps.auth import get_user
+from app.models.user import User
+
+
+class RateLimiter:
+    """
+    Fixed-window request counter keyed by client address or user ID.
+
+    Counters live in process memory, so each worker process enforces its own
+    limit; with several workers a client can make up to `times` requests per
+    worker in each window.
+    """
+
+    def __init__(self, times: int, seconds: int = 60):
+        self.times = times
+        self.seconds = seconds
+
+        # One counter per (key, window); counters expire with their window
+        self._hits: TTLCache = TTLCache(maxsize=100_000, ttl=seconds)
+        self._lock = Lock()
+
+    def hit(self, key, cost: int = 1) -> None:
+        """
+        Counts a request (or `cost` units of work) for the key and raises a 429
+        once the limit is exceeded.
+        """
+        now = time.time()
+        window = int(now // self.seconds)
+
+        with self._lock:
+            count = self._hits.get((key, window), 0) + cost
+            self._hits[(key, window)] = count
+
+        if count > self.times:
+            retry_after = self.seconds - int(now % self.seconds)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    def reset(self) -> None:
+        """
+        Drops every counter.
+        """
+        with self._lock:
+            self._hits.clear()
+
+
+def limit_by_ip(limiter: RateLimiter):
+    """
+    Builds a dependency that limits requests per client address.
+
+    Behind a proxy the address is the X-Forwarded-For client, filled in by the
+    app's ProxyHeadersMiddleware for the hosts in FORWARDED_ALLOW_IPS.
+    """
+
+    def dependency(request: Request) -> None:
+        limiter.hit(request.client.host if request.client else "unknown")
+
+    return dependency
+
+
+def limit_by_user(limiter: RateLimiter):
+    """
+    Builds a dependency that limits requests per authenticated user.
+    """
+
+    def dependency(user: User = Depends(get_user)) -> None:
+        limiter.hit(user.id)
+
+    return dependency
+
+
+# Tiered limits for the expensive routes
+webhook_limiter = RateLimiter(times=600)
+checkout_limiter = RateLimiter(times=10)
+subscription_status_limiter = RateLimiter(times=60)
+task_write_limiter = RateLimiter(times=300)
+
+limiters = (
+    webhook_limiter,
+    checkout_limiter,
+    subscription_status_limiter,
+    task_write_limiter,
+)
@@ -1,19 +1,23 @@
+import logging
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
-from app.core.config import ENV, WEB_URL
+from app import models  # noqa: F401  Register models with Base
+from app.core.config import get_settings
 from app.core.database import Base
 from app.routes import backlogs, notes, stripe, tasks, users
 from app.scheduler import start_scheduler
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load models to register them with Base
-    from app.models import backlog, note, task, user
-
     # Initialize the scheduler
     start_scheduler()
 
@@ -23,19 +27,31 @@ async def lifespan(app: FastAPI):
 # Attach lifespan here
 app = FastAPI(lifespan=lifespan)
 
-# Add CORS middleware
-allowed_origins = []
-if WEB_URL and WEB_URL != "*":
-    allowed_origins.append(WEB_URL)
+# Read the settings once at startup
+settings = get_settings()
+WEB_URL = settings.web_url
+
+
+@lru_cache
+def build_cors_origins(web_url: Optional[str]) -> Tuple[str, ...]:
+    """
+    Builds the allowed CORS origins for the given web URL.
+    """
+    if not web_url or web_url == "*":
+        return ("*",)
+
     # Also add localhost and 127.0.0.1 variants for development
-    if "localhost" in WEB_URL:
-        allowed_origins.append(WEB_URL.replace("localhost", "127.0.0.1"))
-    elif "127.0.0.1" in WEB_URL:
-        allowed_origins.append(WEB_URL.replace("127.0.0.1", "localhost"))
-else:
-    allowed_origins = ["*"]
-
-print("CORS will allow:", allowed_origins)
+    if "localhost" in web_url:
+        return (web_url, web_url.replace("localhost", "127.0.0.1"))
+    if "127.0.0.1" in web_url:
+        return (web_url, web_url.replace("127.0.0.1", "localhost"))
+    return (web_url,)
+
+
+# Add CORS middleware
+allowed_origins = list(build_cors_origins(WEB_URL))
+
+logger.info("CORS will allow: %s", allowed_origins)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -44,6 +60,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Take the client address from X-Forwarded-For, but only when the request
+# comes through one of the trusted proxies
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=settings.forwarded_allow_ips)
+
 # Include routers
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
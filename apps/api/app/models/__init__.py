@@ -2,5 +2,6 @@ from .user import User
 from .task import Task
 from .note import Note
 from .backlog import Backlog
+from .stripe_event import StripeEvent
 
-__all__ = ["User", "Task", "Note", "Backlog"]
+__all__ = ["User", "Task", "Note", "Backlog", "StripeEvent"]
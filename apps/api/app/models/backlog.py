@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, ForeignKey, Integer, String
+from sqlalchemy import Column, Date, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -10,6 +10,7 @@ class Backlog(Base):
     """
 
     __tablename__ = "backlogs"
+    __table_args__ = (Index("ix_backlogs_user_order", "user_id", "order"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, ForeignKey, Integer, String
+from sqlalchemy import Column, Date, ForeignKey, Index, Integer, String, text
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -10,6 +10,15 @@ class Note(Base):
     """
 
     __tablename__ = "notes"
+    __table_args__ = (
+        Index("ix_notes_user_date", "user_id", "date", unique=True),
+        Index(
+            "ix_notes_empty",
+            "id",
+            postgresql_where=text("entry = ''"),
+            sqlite_where=text("entry = ''"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
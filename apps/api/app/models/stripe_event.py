@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String, Text
+
+from app.core.database import Base
+
+
+class StripeEvent(Base):
+    """
+    Stripe Event Database Schema / SQLAlchemy ORM Model
+
+    Webhook events that were accepted but not yet applied; a row is deleted
+    once its event is applied and retried by the scheduler until then.
+    """
+
+    __tablename__ = "stripe_events"
+
+    id = Column(String, primary_key=True)
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Date, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, Date, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -10,6 +10,10 @@ class Task(Base):
     """
 
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_user_date_order", "user_id", "date", "order"),
+        Index("ix_tasks_user_date_completed", "user_id", "date", "is_completed"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -24,6 +24,13 @@ class User(Base):
     )  # (e.g., "active", "canceled", "past_due", etc.)
     is_subscribed = Column(Boolean, default=False)
 
+    # Subscription details mirrored from Stripe webhooks
+    plan_name = Column(String, nullable=True)
+    price_amount = Column(Float, nullable=True)
+    price_currency = Column(String, nullable=True)
+    period_end_ts = Column(Integer, nullable=True)
+    cancel_at_period_end = Column(Boolean, default=False)
+
     tasks = relationship("Task", back_populates="user", cascade="all, delete-orphan")
     notes = relationship("Note", back_populates="user", cascade="all, delete-orphan")
     backlogs = relationship(
@@ -1,7 +1,9 @@
 from datetime import date, timedelta
+from threading import Lock
 from typing import List, Optional
 from uuid import uuid4
 
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import case, func
 from sqlalchemy.orm import Session
@@ -15,6 +17,21 @@ from app.schemas.backlog import BacklogCreate, BacklogOut, BacklogUpdate
 # Create a router
 router = APIRouter()
 
+# Ordered backlogs per user, cleared whenever that user's backlogs change.
+# The cache is per process and writes only clear it in the process that
+# handled them, so this assumes a single worker; with several, another worker
+# can serve a stale list until the 60 s TTL runs out
+_backlogs_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+_backlogs_cache_lock = Lock()
+
+
+def clear_backlogs_cache(user_id: int) -> None:
+    """
+    Drops the cached backlogs for the given user.
+    """
+    with _backlogs_cache_lock:
+        _backlogs_cache.pop(user_id, None)
+
 
 @router.get("/", response_model=List[BacklogOut])
 def get_backlogs(
@@ -25,8 +42,21 @@ def get_backlogs(
     Get backlogs for the current user.
     """
     user_id = user.id
-    query = db.query(Backlog).filter(Backlog.user_id == user_id)
-    return query.order_by(Backlog.order).all()
+    with _backlogs_cache_lock:
+        cached = _backlogs_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    query = db.query(Backlog.id, Backlog.date, Backlog.detail, Backlog.order).filter(
+        Backlog.user_id == user_id
+    )
+    backlogs = [
+        BacklogOut.model_validate(row) for row in query.order_by(Backlog.order).all()
+    ]
+
+    with _backlogs_cache_lock:
+        _backlogs_cache[user_id] = backlogs
+    return backlogs
 
 
 @router.post("/", response_model=BacklogOut)
@@ -55,6 +85,7 @@ def create_backlog(
 
     db.add(new_backlog)
     db.commit()
+    clear_backlogs_cache(user_id)
     db.refresh(new_backlog)
 
     return new_backlog
@@ -71,12 +102,8 @@ def update_backlog(
     Update a backlog for the current user.
     """
     user_id = user.id
-    backlog = (
-        db.query(Backlog)
-        .filter(Backlog.id == backlog_id, Backlog.user_id == user_id)
-        .first()
-    )
-    if not backlog:
+    backlog = db.get(Backlog, backlog_id)
+    if not backlog or backlog.user_id != user_id:
         raise HTTPException(status_code=404, detail="Backlog not found")
 
     update_data = updates.model_dump(exclude_unset=True)
@@ -101,38 +128,40 @@ def update_backlog(
         if new_order is None or new_order < 1:
             raise HTTPException(status_code=400, detail="Order must be 1 or greater")
 
-        other_backlogs = (
-            db.query(Backlog)
+        other_count = (
+            db.query(func.count(Backlog.id))
             .filter(Backlog.user_id == user_id, Backlog.id != backlog_id)
-            .order_by(Backlog.order)
-            .all()
+            .scalar()
         )
 
         # Ensure the new order is within the valid range
-        max_order = len(other_backlogs) + 1
+        max_order = other_count + 1
         if new_order > max_order:
             new_order = max_order
 
-        current_order = getattr(backlog, "order")
-        for t in other_backlogs:
-            t_order = getattr(t, "order")
-            # Shift backlogs down
-            if current_order < new_order:
-                if current_order < t_order <= new_order:
-                    setattr(t, "order", t_order - 1)
-            # Shift backlogs up
-            else:
-                if new_order <= t_order < current_order:
-                    setattr(t, "order", t_order + 1)
+        current_order = backlog.order
+        # Shift backlogs down
+        if current_order < new_order:
+            low, high, delta = current_order + 1, new_order, -1
+        # Shift backlogs up
+        else:
+            low, high, delta = new_order, current_order - 1, 1
+
+        db.query(Backlog).filter(
+            Backlog.user_id == user_id,
+            Backlog.id != backlog_id,
+            Backlog.order.between(low, high),
+        ).update({Backlog.order: Backlog.order + delta}, synchronize_session=False)
 
-        setattr(backlog, "order", new_order)
+        backlog.order = new_order
 
     # Handle detail and date update
     elif {"detail"} & update_fields:
-        setattr(backlog, "detail", update_data.get("detail"))
-        setattr(backlog, "date", date.today())
+        backlog.detail = update_data.get("detail")
+        backlog.date = date.today()
 
     db.commit()
+    clear_backlogs_cache(user_id)
     db.refresh(backlog)
     return backlog
 
@@ -147,12 +176,8 @@ def delete_backlog(
     Delete a backlog for the current user.
     """
     user_id = user.id
-    backlog = (
-        db.query(Backlog)
-        .filter(Backlog.id == backlog_id, Backlog.user_id == user_id)
-        .first()
-    )
-    if not backlog:
+    backlog = db.get(Backlog, backlog_id)
+    if not backlog or backlog.user_id != user_id:
         raise HTTPException(status_code=404, detail="Backlog not found")
 
     backlog_order = backlog.order
@@ -161,15 +186,10 @@ def delete_backlog(
     db.commit()
 
     # Reorder the remaining backlogs
-    remaining_backlogs = (
-        db.query(Backlog)
-        .filter(Backlog.user_id == user_id, Backlog.order > backlog_order)
-        .order_by(Backlog.order)
-        .all()
-    )
-
-    for t in remaining_backlogs:
-        setattr(t, "order", getattr(t, "order") - 1)
+    db.query(Backlog).filter(
+        Backlog.user_id == user_id, Backlog.order > backlog_order
+    ).update({Backlog.order: Backlog.order - 1}, synchronize_session=False)
 
     db.commit()
+    clear_backlogs_cache(user_id)
     return {"message": "Backlog deleted and remaining reordered"}
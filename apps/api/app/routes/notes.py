@@ -1,6 +1,8 @@
 from datetime import date
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
@@ -29,9 +31,20 @@ def get_or_create_note(
     if note:
         return note
 
-    # Create a new note if it doesn't exist
-    new_note = Note(date=date, user_id=user_id, entry="")
-    db.add(new_note)
+    # Create a new note, leaving any note inserted concurrently untouched
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = (
+        insert(Note)
+        .values(user_id=user_id, date=date, entry="")
+        .on_conflict_do_nothing(index_elements=["user_id", "date"])
+        .returning(Note)
+    )
+    new_note = db.scalars(stmt).first()
+    if new_note is None:
+        new_note = (
+            db.query(Note).filter(Note.user_id == user_id, Note.date == date).first()
+        )
+
     db.commit()
     db.refresh(new_note)
     return new_note
@@ -74,8 +87,8 @@ def update_note(
     """
     # Check if note exists
     user_id = user.id
-    note = db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).first()
-    if not note:
+    note = db.get(Note, note_id)
+    if not note or note.user_id != user_id:
         raise HTTPException(status_code=404, detail="Note not found")
 
     # Update the note
@@ -99,12 +112,12 @@ def clear_note(
     """
     # Check if note exists
     user_id = user.id
-    note = db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).first()
-    if not note:
+    note = db.get(Note, note_id)
+    if not note or note.user_id != user_id:
         raise HTTPException(status_code=404, detail="Note not found")
 
     # Update the note
-    setattr(note, "entry", "")
+    note.entry = ""
 
     db.commit()
     db.refresh(note)
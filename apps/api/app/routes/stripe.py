@@ -1,92 +1,203 @@
+import asyncio
+import json
 import logging
-import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 
 import stripe
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
-from firebase_admin import auth
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+)
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.deps.auth import get_subscribed_user, get_user
+from app.core.config import get_settings
+from app.core.database import SessionLocal, get_db
+from app.deps.auth import get_subscribed_user, get_user, require_admin
+from app.deps.rate_limit import (
+    checkout_limiter,
+    limit_by_ip,
+    limit_by_user,
+    subscription_status_limiter,
+    webhook_limiter,
+)
+from app.models.stripe_event import StripeEvent
 from app.models.user import User
 from app.schemas.stripe import CheckoutSessionCreate, StripeCheckout, SubscriptionStatus
+from app.services.stripe_cache import (
+    forget_event,
+    get_or_fetch_price,
+    get_or_fetch_subscription,
+    invalidate_subscription,
+    mark_event_seen,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-
-@router.get("/subscription-status", response_model=SubscriptionStatus)
+# Month abbreviations for the billing period end date
+MONTHS = (
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+)
+
+# Stored events younger than this may still be in their first background run
+RETRY_AFTER = timedelta(minutes=5)
+
+# Stripe stops redelivering after three days; older stored events are left
+# for inspection instead of being retried forever
+RETRY_WINDOW = timedelta(days=3)
+
+# Fixed statuses for users without a Stripe subscription
+LIFETIME_RESPONSE = SubscriptionStatus(
+    is_subscribed=True,
+    status="lifetime",
+    plan_name="Lifetime Access",
+    price_amount=29.99,
+    price_currency="USD",
+)
+NONE_RESPONSE = SubscriptionStatus(is_subscribed=False, status="none")
+
+
+@router.get(
+    "/subscription-status",
+    response_model=SubscriptionStatus,
+    dependencies=[Depends(limit_by_user(subscription_status_limiter))],
+)
 def get_subscription_status(
-    db: Session = Depends(get_db),
     user: User = Depends(get_user),
 ):
     """
-    Get the current subscription status for the user.
+    Get the current subscription status for the user from the stored details.
+    Stripe is only read by webhooks, the admin refresh route and the
+    backfill_subscription_details script.
     """
-    if not getattr(user, "stripe_subscription_id"):
-        if getattr(user, "subscription_status") == "lifetime":
-            return {
-                "is_subscribed": True,
-                "status": "lifetime",
-                "period_end_date": None,
-                "cancel_at_period_end": None,
-                "plan_name": "Lifetime Access",
-                "price_amount": 29.99,
-                "price_currency": "USD",
-            }
-        return JSONResponse(
-            {
-                "is_subscribed": False,
-                "status": "none",
-                "period_end_date": None,
-                "cancel_at_period_end": None,
-                "plan_name": None,
-                "price_amount": None,
-                "price_currency": None,
-            }
-        )
+    if not user.stripe_subscription_id:
+        if user.subscription_status == "lifetime":
+            return LIFETIME_RESPONSE
+        return NONE_RESPONSE
 
-    try:
-        # Retrieve the subscription from Stripe
-        subscription = stripe.Subscription.retrieve(
-            getattr(user, "stripe_subscription_id"), expand=["items.data.price.product"]
-        )
+    return subscription_status_from_user(user)
 
-        # Parse the subscription details
-        item = subscription["items"]["data"][0]
-        period_end_timestamp = item.get("current_period_end") or subscription.get(
-            "trial_end"
-        )
-        period_end_date = (
-            datetime.fromtimestamp(period_end_timestamp).strftime("%b %d, %Y")
-            if period_end_timestamp
-            else None
-        )
-        price = item["price"]
-        product = price["product"]
-
-        # Return the subscription status
-        return {
-            "is_subscribed": subscription["status"] == "active",
-            "status": subscription["status"],
-            "period_end_date": period_end_date,
-            "cancel_at_period_end": subscription.get("cancel_at_period_end", False),
-            "plan_name": product["name"],
-            "price_amount": round(price["unit_amount"] / 100, 2),
-            "price_currency": price["currency"].upper(),
-        }
 
+@router.post(
+    "/refresh-subscription/{user_id}",
+    response_model=SubscriptionStatus,
+    dependencies=[Depends(require_admin)],
+)
+def refresh_subscription(
+    user_id: int,
+    db: Session = Depends(get_db),
+):
+    """
+    Re-read a user's subscription from Stripe and update the stored copy.
+    Admin only, so clients cannot drive uncached Stripe calls.
+    """
+    user = db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not user.stripe_subscription_id:
+        raise HTTPException(status_code=400, detail="No subscription to refresh.")
+
+    try:
+        invalidate_subscription(user.stripe_subscription_id)
+        refresh_subscription_details(user)
+        db.commit()
     except stripe.StripeError as e:
-        logger.exception("Stripe error while getting subscription status: %s", str(e))
+        logger.exception("Stripe error while refreshing subscription: %s", str(e))
         raise HTTPException(
             status_code=502,
             detail=str(e) or "Stripe error",
         )
 
+    return subscription_status_from_user(user)
+
+
+def subscription_status_from_user(user: User) -> dict:
+    """
+    Build the subscription status from the details stored on the user.
+    """
+    period_end_date = (
+        format_period_end(user.period_end_ts) if user.period_end_ts else None
+    )
+
+    return {
+        "is_subscribed": user.subscription_status == "active",
+        "status": user.subscription_status,
+        "period_end_date": period_end_date,
+        "cancel_at_period_end": bool(user.cancel_at_period_end),
+        "plan_name": user.plan_name,
+        "price_amount": user.price_amount,
+        "price_currency": user.price_currency,
+    }
+
+
+def format_period_end(timestamp: int) -> str:
+    """
+    Format a Unix timestamp as e.g. "Jan 01, 2022" (UTC), without strftime.
+    """
+    tm = time.gmtime(timestamp)
+    return f"{MONTHS[tm.tm_mon - 1]} {tm.tm_mday:02d}, {tm.tm_year}"
 
-@router.post("/create-checkout-session", response_model=StripeCheckout)
+
+def sync_subscription_details(user: User, subscription) -> None:
+    """
+    Copy the plan, price and billing period of a Stripe subscription to the user.
+    """
+    items = (subscription.get("items") or {}).get("data") or []
+    item = items[0] if items else {}
+    price_id = (item.get("price") or {}).get("id")
+    price = get_or_fetch_price(price_id) if price_id else {}
+
+    # Custom and metered prices have no unit amount
+    unit_amount = price.get("unit_amount")
+    user.plan_name = (price.get("product") or {}).get("name")
+    user.price_amount = round(unit_amount / 100, 2) if unit_amount is not None else None
+    user.price_currency = (price.get("currency") or "").upper() or None
+    user.period_end_ts = item.get("current_period_end") or subscription.get("trial_end")
+    user.cancel_at_period_end = subscription.get("cancel_at_period_end", False)
+
+
+def refresh_subscription_details(user: User) -> None:
+    """
+    Fetch the user's subscription from Stripe and store its details on the user.
+    """
+    subscription = get_or_fetch_subscription(user.stripe_subscription_id)
+    sync_subscription_details(user, subscription)
+    user.subscription_status = subscription["status"]
+
+
+def clear_subscription_details(user: User) -> None:
+    """
+    Remove the stored plan, price and billing period from the user.
+    """
+    user.plan_name = None
+    user.price_amount = None
+    user.price_currency = None
+    user.period_end_ts = None
+    user.cancel_at_period_end = False
+
+
+@router.post(
+    "/create-checkout-session",
+    response_model=StripeCheckout,
+    dependencies=[Depends(limit_by_user(checkout_limiter))],
+)
 async def create_checkout_session(
     checkout_session: CheckoutSessionCreate,
     db: Session = Depends(get_db),
@@ -95,17 +206,16 @@ async def create_checkout_session(
     """
     Create a Stripe Checkout session for a user.
     """
-    # Get the user's Firebase UID and email
-    firebase_uid = getattr(user, "firebase_uid")
-    email = getattr(user, "email")
+    # Get the user's email
+    email = user.email
 
     # Create a Stripe customer if the user doesn't have one
     try:
-        if not getattr(user, "stripe_customer_id"):
-            customer = stripe.Customer.create(email=email)
+        if not user.stripe_customer_id:
+            customer = await asyncio.to_thread(stripe.Customer.create, email=email)
 
             # Update the user with the Stripe customer ID
-            setattr(user, "stripe_customer_id", customer.id)
+            user.stripe_customer_id = customer.id
             db.commit()
     except stripe.StripeError as e:
         logger.exception("Stripe error while creating customer: %s", str(e))
@@ -115,23 +225,16 @@ async def create_checkout_session(
         )
 
     # Create a Stripe Checkout session
+    line_items = [{"price": checkout_session.price_id, "quantity": 1}]
     try:
-        if checkout_session.mode == "subscription":
-            session = stripe.checkout.Session.create(
-                customer=getattr(user, "stripe_customer_id"),
-                mode=checkout_session.mode,  # type: ignore
-                line_items=[{"price": checkout_session.price_id, "quantity": 1}],
-                success_url=checkout_session.success_url,
-                cancel_url=checkout_session.cancel_url,
-            )
-        else:
-            session = stripe.checkout.Session.create(
-                customer=getattr(user, "stripe_customer_id"),
-                mode=checkout_session.mode,  # type: ignore
-                line_items=[{"price": checkout_session.price_id, "quantity": 1}],
-                success_url=checkout_session.success_url,
-                cancel_url=checkout_session.cancel_url,
-            )
+        session = await asyncio.to_thread(
+            stripe.checkout.Session.create,
+            customer=user.stripe_customer_id,
+            mode=checkout_session.mode,  # type: ignore
+            line_items=line_items,
+            success_url=checkout_session.success_url,
+            cancel_url=checkout_session.cancel_url,
+        )
 
         # Return the session URL
         return {"url": session.url}
@@ -143,7 +246,7 @@ async def create_checkout_session(
         )
 
 
-@router.post("/cancel-subscription")
+@router.post("/cancel-subscription", status_code=204)
 def cancel_subscription(
     db: Session = Depends(get_db),
     user: User = Depends(get_subscribed_user),
@@ -151,23 +254,22 @@ def cancel_subscription(
     """
     Cancel the user's active Stripe subscription.
     """
-    if not getattr(user, "stripe_subscription_id"):
+    if not user.stripe_subscription_id:
         raise HTTPException(status_code=400, detail="No active subscription to cancel.")
 
     try:
         # Cancel at period end (or use cancel_now=True to cancel immediately)
         stripe.Subscription.modify(
-            getattr(user, "stripe_subscription_id"),
+            user.stripe_subscription_id,
             cancel_at_period_end=True,
         )
 
         # Update local status immediately (optional: delay until webhook arrives)
-        setattr(user, "subscription_status", "canceled")
+        user.subscription_status = "canceled"
+        user.cancel_at_period_end = True
         db.commit()
 
-        return {
-            "message": "Subscription will be canceled at the end of the current billing period."
-        }
+        return Response(status_code=204)
 
     except stripe.StripeError as e:
         logger.exception(
@@ -180,27 +282,135 @@ def cancel_subscription(
         )
 
 
-@router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+@router.post("/webhook", dependencies=[Depends(limit_by_ip(webhook_limiter))])
+async def stripe_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     """
-    Handle Stripe post-checkout events.
+    Verify and store a Stripe event, then process it after the response is sent.
     """
     # Verify the Stripe webhook signature
     payload = (await request.body()).decode("utf-8")
     sig_header = request.headers.get("stripe-signature", "")
-    webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
-
-    print("STRIPE_PAYLOAD:", payload)
-    print("STRIPE_SIG_HEADER:", sig_header)
+    webhook_secret = get_settings().stripe_webhook_secret
 
+    # The SDK compares signatures in constant time; reject every failure alike
     try:
         event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
-    except ValueError:
-        raise HTTPException(400, detail="Invalid payload")
-    except stripe.SignatureVerificationError as e:
-        print("Stripe signature verification failed:", e)
-        raise HTTPException(400, detail="Invalid signature")
+    except (ValueError, stripe.SignatureVerificationError) as e:
+        logger.warning("Stripe webhook verification failed: %s", e)
+        raise HTTPException(400, detail="Invalid payload or signature")
+
+    # Stripe retries deliveries; skip events that were already accepted
+    event_id = event.get("id")
+    if event_id and not mark_event_seen(event_id):
+        logger.info("Skipping duplicate Stripe event %s", event_id)
+        return {"received": True}
+
+    # Stripe does not redeliver after a 2xx, so keep the event until it is
+    # applied; if it cannot be stored, fail so Stripe sends it again
+    if event_id:
+        try:
+            stored = await asyncio.to_thread(
+                store_stripe_event, db, event_id, event["type"], payload
+            )
+        except Exception:
+            logger.exception("Failed to store Stripe event %s", event_id)
 
+            # The event was marked seen above; let Stripe's retry through
+            forget_event(event_id)
+            raise HTTPException(500, detail="Failed to store event")
+
+        if not stored:
+            logger.info("Skipping already stored Stripe event %s", event_id)
+            return {"received": True}
+
+    # Drop any cached copy of the subscription this event touches
+    data_object = event["data"]["object"]
+    if event["type"].startswith("customer.subscription."):
+        invalidate_subscription(data_object.get("id"))
+    elif data_object.get("subscription"):
+        invalidate_subscription(data_object.get("subscription"))
+
+    # Reply to Stripe right away; the event is applied on its own session
+    background_tasks.add_task(process_stripe_event, event)
+
+    return {"received": True}
+
+
+def store_stripe_event(
+    db: Session, event_id: str, event_type: str, payload: str
+) -> bool:
+    """
+    Store a verified Stripe event until it is applied. Returns False if the
+    event is already stored.
+    """
+    try:
+        if db.get(StripeEvent, event_id):
+            return False
+
+        db.add(StripeEvent(id=event_id, type=event_type, payload=payload))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return True
+
+
+def process_stripe_event(event) -> None:
+    """
+    Apply a verified Stripe event in the threadpool, after the response is sent.
+    """
+    # The request's session may already be closed, so open one for the task
+    db = SessionLocal()
+    try:
+        apply_stripe_event(event, db)
+
+        # Applied; the stored copy is no longer needed
+        if event.get("id"):
+            db.query(StripeEvent).filter_by(id=event["id"]).delete()
+            db.commit()
+    except Exception:
+        db.rollback()
+        # Stripe got a 200 and will not redeliver; the stored copy is retried
+        # by retry_stored_events instead
+        logger.exception("Failed to process Stripe event %s", event.get("id"))
+    finally:
+        db.close()
+
+
+def retry_stored_events() -> int:
+    """
+    Apply stored Stripe events whose first attempt failed. Returns how many
+    events were retried.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        payloads = db.scalars(
+            select(StripeEvent.payload)
+            .where(
+                StripeEvent.created_at.between(now - RETRY_WINDOW, now - RETRY_AFTER)
+            )
+            .order_by(StripeEvent.created_at)
+        ).all()
+    finally:
+        db.close()
+
+    # The stored payload is the verified request body
+    for payload in payloads:
+        process_stripe_event(json.loads(payload))
+
+    return len(payloads)
+
+
+def apply_stripe_event(event, db: Session) -> None:
+    """
+    Apply a verified Stripe event to the matching user.
+    """
     # Get the event type and data object
     event_type = event["type"]
     data_object = event["data"]["object"]
@@ -212,11 +422,11 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         user = db.query(User).filter_by(stripe_customer_id=customer_id).first()
 
         if user:
-            setattr(user, "is_subscribed", True)
+            user.is_subscribed = True
 
             if subscription_id and mode == "subscription":
                 # Update the user's subscription status
-                existing_subscription_id = getattr(user, "stripe_subscription_id")
+                existing_subscription_id = user.stripe_subscription_id
                 if (
                     existing_subscription_id
                     and existing_subscription_id != subscription_id
@@ -227,21 +437,30 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
                     except stripe.StripeError as e:
                         logger.warning("Failed to cancel old subscription: %s", e)
 
-                setattr(user, "stripe_subscription_id", subscription_id)
-                setattr(user, "subscription_status", "active")
+                user.stripe_subscription_id = subscription_id
+                user.subscription_status = "active"
+
+                # Store the plan details served by /subscription-status
+                # A failed details sync must not lose the status change above
+                try:
+                    subscription = get_or_fetch_subscription(subscription_id)
+                    sync_subscription_details(user, subscription)
+                except Exception:
+                    logger.exception("Failed to sync subscription details")
             elif mode == "payment":
-                setattr(user, "subscription_status", "lifetime")
-                setattr(user, "plan_name", "Lifetime Access")
+                user.subscription_status = "lifetime"
+                clear_subscription_details(user)
+                user.plan_name = "Lifetime Access"
 
                 # Cancel old subscription if it exists
-                existing_subscription_id = getattr(user, "stripe_subscription_id")
+                existing_subscription_id = user.stripe_subscription_id
                 if existing_subscription_id:
                     try:
                         stripe.Subscription.delete(existing_subscription_id)
                     except stripe.StripeError as e:
                         logger.warning("Failed to cancel old subscription: %s", e)
 
-                    setattr(user, "stripe_subscription_id", None)
+                    user.stripe_subscription_id = None
 
             db.commit()
 
@@ -250,8 +469,8 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         user = db.query(User).filter_by(stripe_customer_id=customer_id).first()
 
         if user:
-            setattr(user, "is_subscribed", True)
-            setattr(user, "subscription_status", "active")
+            user.is_subscribed = True
+            user.subscription_status = "active"
             db.commit()
 
     elif event_type == "customer.subscription.updated":
@@ -263,9 +482,17 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         user = db.query(User).filter_by(stripe_customer_id=customer_id).first()
 
         if user:
-            setattr(user, "stripe_subscription_id", subscription_id)
-            setattr(user, "subscription_status", status)
-            setattr(user, "is_subscribed", status in ("active", "trialing"))
+            user.stripe_subscription_id = subscription_id
+            user.subscription_status = status
+            user.is_subscribed = status in ("active", "trialing")
+
+            # Store the plan details served by /subscription-status
+            # A failed details sync must not lose the status change above
+            try:
+                sync_subscription_details(user, data_object)
+            except Exception:
+                logger.exception("Failed to sync subscription details")
+
             db.commit()
 
     elif event_type == "customer.subscription.deleted":
@@ -275,13 +502,14 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         user = db.query(User).filter_by(stripe_customer_id=customer_id).first()
 
         # Check if the user has a subscription linked to the customer ID
-        if user and getattr(user, "stripe_subscription_id") == subscription_id:
+        if user and user.stripe_subscription_id == subscription_id:
             if data_object.get("cancel_at_period_end"):
-                setattr(user, "subscription_status", "canceled")
+                user.subscription_status = "canceled"
             else:
-                setattr(user, "subscription_status", "deleted")
-                setattr(user, "is_subscribed", False)
-                setattr(user, "stripe_subscription_id", None)
+                user.subscription_status = "deleted"
+                user.is_subscribed = False
+                user.stripe_subscription_id = None
+                clear_subscription_details(user)
 
             db.commit()
 
@@ -291,13 +519,11 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         user = db.query(User).filter_by(stripe_customer_id=customer_id).first()
 
         if user:
-            setattr(user, "is_subscribed", False)
-            setattr(user, "subscription_status", "past_due")
+            user.is_subscribed = False
+            user.subscription_status = "past_due"
             db.commit()
 
     else:
         logger.warning(
             f"Customer ID {customer_id or '[unknown]'} not linked to any user."
         )
-
-    return {"received": True}
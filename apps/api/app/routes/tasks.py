@@ -1,13 +1,16 @@
+from collections import Counter
 from datetime import date, timedelta
-from typing import List, Optional
+from typing import Annotated, List, Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import case, func
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import Field, TypeAdapter
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.deps.auth import get_user
+from app.deps.rate_limit import limit_by_user, task_write_limiter
 from app.models.task import Task
 from app.models.user import User
 from app.schemas.task import CompletionOut, TaskCreate, TaskOut, TaskUpdate
@@ -15,6 +18,18 @@ from app.schemas.task import CompletionOut, TaskCreate, TaskOut, TaskUpdate
 # Create a router
 router = APIRouter()
 
+# Sum of completed tasks (1 if completed, else 0), built once
+COMPLETED_SUM = func.sum(case((Task.is_completed.is_(True), 1), else_=0)).label(
+    "completed"
+)
+
+# Most tasks one batch request may create; each one counts against the write limit
+MAX_BATCH_SIZE = 100
+
+# Serializers for the list responses, built once
+_task_list_adapter = TypeAdapter(List[TaskOut])
+_completion_list_adapter = TypeAdapter(List[CompletionOut])
+
 
 @router.get("/", response_model=List[TaskOut])
 def get_tasks(
@@ -27,13 +42,23 @@ def get_tasks(
     Get tasks for the current user between the start and end dates.
     """
     user_id = user.id
-    query = db.query(Task).filter(Task.user_id == user_id)
+    stmt = select(
+        Task.id, Task.date, Task.title, Task.note, Task.is_completed, Task.order
+    ).where(Task.user_id == user_id)
     if start and end:
-        query = query.filter(Task.date.between(start, end))
-    return query.order_by(Task.order).all()
+        stmt = stmt.where(Task.date.between(start, end))
 
+    # Rows come straight from the database, so skip re-validating them
+    rows = db.execute(stmt.order_by(Task.order))
+    tasks = [TaskOut.model_construct(**row._mapping) for row in rows]
+    return Response(_task_list_adapter.dump_json(tasks), media_type="application/json")
 
-@router.post("/", response_model=TaskOut)
+
+@router.post(
+    "/",
+    response_model=TaskOut,
+    dependencies=[Depends(limit_by_user(task_write_limiter))],
+)
 def create_task(
     task: TaskCreate,
     db: Session = Depends(get_db),
@@ -66,7 +91,60 @@ def create_task(
     return new_task
 
 
-@router.patch("/{task_id}", response_model=TaskOut)
+@router.post("/batch", response_model=List[TaskOut])
+def create_tasks(
+    tasks: Annotated[List[TaskCreate], Field(max_length=MAX_BATCH_SIZE)],
+    db: Session = Depends(get_db),
+    user: User = Depends(get_user),
+):
+    """
+    Create several tasks for the current user in one transaction, ordered as if
+    each had been created in turn.
+    """
+    user_id = user.id
+
+    # Charge the write limit per task, not per request
+    task_write_limiter.hit(user_id, cost=len(tasks))
+
+    new_counts = Counter(task.date for task in tasks)
+
+    # Shift existing tasks' order by the number of new tasks on their date
+    for task_date, count in new_counts.items():
+        db.query(Task).filter(Task.user_id == user_id, Task.date == task_date).update(
+            {Task.order: Task.order + count}, synchronize_session=False
+        )
+
+    # Later tasks land above earlier ones, the last one at the top
+    new_tasks = []
+    for task in tasks:
+        new_tasks.append(
+            Task(
+                user_id=user_id,
+                date=task.date,
+                title=task.title,
+                note=task.note,
+                is_completed=task.is_completed,
+                order=new_counts[task.date],
+            )
+        )
+        new_counts[task.date] -= 1
+
+    db.add_all(new_tasks)
+    db.flush()
+
+    # Serialize before committing so the new rows are not reloaded one by one
+    body = _task_list_adapter.dump_json(
+        [TaskOut.model_validate(task) for task in new_tasks]
+    )
+    db.commit()
+    return Response(body, media_type="application/json")
+
+
+@router.patch(
+    "/{task_id}",
+    response_model=TaskOut,
+    dependencies=[Depends(limit_by_user(task_write_limiter))],
+)
 def update_task(
     task_id: int,
     updates: TaskUpdate,
@@ -77,12 +155,18 @@ def update_task(
     Update a task for the current user.
     """
     user_id = user.id
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+    task = db.scalars(
+        select(Task).where(Task.id == task_id, Task.user_id == user_id)
+    ).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     update_data = updates.model_dump(exclude_unset=True)
 
+    # Nothing to change, so skip the write
+    if not update_data:
+        return task
+
     # Enforce only one type of update at a time
     update_fields = set(update_data.keys())
     groups = {
@@ -108,32 +192,21 @@ def update_task(
         if new_date != old_date:
             task.date = new_date
 
-            # Reorder tasks from the old date
-            old_day_tasks = (
-                db.query(Task)
-                .filter(
-                    Task.user_id == user_id, Task.date == old_date, Task.id != task.id
-                )
-                .order_by(Task.order)
-                .all()
-            )
-            for idx, t in enumerate(old_day_tasks, start=1):
-                setattr(t, "order", idx)
+            # Close the gap left on the old date
+            db.query(Task).filter(
+                Task.user_id == user_id,
+                Task.date == old_date,
+                Task.id != task.id,
+                Task.order > task.order,
+            ).update({Task.order: Task.order - 1}, synchronize_session=False)
 
             # Shift other tasks on the new date
-            new_day_tasks = (
-                db.query(Task)
-                .filter(
-                    Task.user_id == user_id, Task.date == new_date, Task.id != task.id
-                )
-                .order_by(Task.order.desc())
-                .all()
-            )
-            for t in new_day_tasks:
-                setattr(t, "order", getattr(t, "order") + 1)
+            db.query(Task).filter(
+                Task.user_id == user_id, Task.date == new_date, Task.id != task.id
+            ).update({Task.order: Task.order + 1}, synchronize_session=False)
 
             # Put the moved task at the top
-            setattr(task, "order", 1)
+            task.order = 1
 
     # Handle order update
     elif "order" in update_fields:
@@ -141,31 +214,33 @@ def update_task(
         if new_order is None or new_order < 1:
             raise HTTPException(status_code=400, detail="Order must be 1 or greater")
 
-        same_day_tasks = (
-            db.query(Task)
+        other_count = (
+            db.query(func.count(Task.id))
             .filter(Task.user_id == user_id, Task.date == task.date, Task.id != task_id)
-            .order_by(Task.order)
-            .all()
+            .scalar()
         )
 
         # Ensure the new order is within the valid range
-        max_order = len(same_day_tasks) + 1
+        max_order = other_count + 1
         if new_order > max_order:
             new_order = max_order
 
-        current_order = getattr(task, "order")
-        for t in same_day_tasks:
-            t_order = getattr(t, "order")
-            # Shift tasks down
-            if current_order < new_order:
-                if current_order < t_order <= new_order:
-                    setattr(t, "order", t_order - 1)
-            # Shift tasks up
-            else:
-                if new_order <= t_order < current_order:
-                    setattr(t, "order", t_order + 1)
+        current_order = task.order
+        # Shift tasks down
+        if current_order < new_order:
+            low, high, delta = current_order + 1, new_order, -1
+        # Shift tasks up
+        else:
+            low, high, delta = new_order, current_order - 1, 1
+
+        db.query(Task).filter(
+            Task.user_id == user_id,
+            Task.date == task.date,
+            Task.id != task_id,
+            Task.order.between(low, high),
+        ).update({Task.order: Task.order + delta}, synchronize_session=False)
 
-        setattr(task, "order", new_order)
+        task.order = new_order
 
     # Handle title/note update
     elif {"title", "note"} & update_fields:
@@ -178,34 +253,32 @@ def update_task(
         new_status = update_data["is_completed"]
         task.is_completed = new_status
 
-        # Get all tasks for the same day (excluding the current task)
-        same_day_tasks = (
-            db.query(Task)
-            .filter(Task.user_id == user_id, Task.date == task.date, Task.id != task.id)
-            .order_by(Task.order)
-            .all()
+        other_tasks = db.query(Task).filter(
+            Task.user_id == user_id, Task.date == task.date, Task.id != task.id
         )
 
         if new_status:
             # If marking as completed, move the task to the last position.
-            current_order = getattr(task, "order")
-            for t in same_day_tasks:
-                t_order = getattr(t, "order")
-                if t_order > current_order:
-                    setattr(t, "order", t_order - 1)
-            setattr(task, "order", len(same_day_tasks) + 1)
+            other_count = other_tasks.count()
+            other_tasks.filter(Task.order > task.order).update(
+                {Task.order: Task.order - 1}, synchronize_session=False
+            )
+            task.order = other_count + 1
         else:
             # If marking as incomplete, move the task to the first position.
-            for t in same_day_tasks:
-                setattr(t, "order", getattr(t, "order") + 1)
-            setattr(task, "order", 1)
+            other_tasks.update({Task.order: Task.order + 1}, synchronize_session=False)
+            task.order = 1
 
     db.commit()
     db.refresh(task)
     return task
 
 
-@router.delete("/{task_id}")
+@router.delete(
+    "/{task_id}",
+    status_code=204,
+    dependencies=[Depends(limit_by_user(task_write_limiter))],
+)
 def delete_task(
     task_id: int,
     db: Session = Depends(get_db),
@@ -215,32 +288,25 @@ def delete_task(
     Delete a task for the current user.
     """
     user_id = user.id
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+    task = db.scalars(
+        select(Task).where(Task.id == task_id, Task.user_id == user_id)
+    ).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    affected_dates = []
+    task_date = task.date
+    task_order = task.order
 
     # Delete the single task
-    affected_dates = [task.date]
     db.delete(task)
 
-    db.commit()
-
     # Reorder the remaining tasks
-    for d in affected_dates:
-        remaining_tasks = (
-            db.query(Task)
-            .filter(Task.user_id == user_id, Task.date == d)
-            .order_by(Task.order)
-            .all()
-        )
-
-        for i, t in enumerate(remaining_tasks, start=1):
-            setattr(t, "order", i)
+    db.query(Task).filter(
+        Task.user_id == user_id, Task.date == task_date, Task.order > task_order
+    ).update({Task.order: Task.order - 1}, synchronize_session=False)
 
     db.commit()
-    return {"message": "Task(s) deleted and reordered"}
+    return Response(status_code=204)
 
 
 @router.get("/completion/", response_model=List[CompletionOut])
@@ -252,34 +318,21 @@ def get_completion_status(
 ):
     user_id = user.id
 
-    # Create an expression to sum up completed tasks (1 if completed, else 0)
-    completed_sum = func.sum(case((Task.is_completed == True, 1), else_=0)).label(
-        "completed"
-    )
-
     # Query for each day: count total tasks and sum the completed tasks.
-    results = (
-        db.query(
-            Task.date,
-            func.count(Task.id).label("total"),
-            completed_sum,
-        )
-        .filter(
-            Task.user_id == user_id,
-            Task.date.between(start, end),
-        )
+    results = db.execute(
+        select(Task.date, func.count().label("total"), COMPLETED_SUM)
+        .where(Task.user_id == user_id, Task.date.between(start, end))
         .group_by(Task.date)
         .order_by(Task.date)
-        .all()
     )
 
-    # Format the results
+    # Aggregated rows need no validation; serialize them directly
     completions = [
-        {
-            "date": row.date,
-            "total": row.total,
-            "completed": row.completed or 0,
-        }
+        CompletionOut.model_construct(
+            date=row.date, total=row.total, completed=row.completed or 0
+        )
         for row in results
     ]
-    return completions
+    return Response(
+        _completion_list_adapter.dump_json(completions), media_type="application/json"
+    )
@@ -5,10 +5,15 @@ These routes are only for testing purposes.
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, selectinload
 
 from app.core.database import get_db
-from app.deps.auth import get_subscribed_user, get_token
+from app.deps.auth import (
+    find_user_by_firebase_uid,
+    get_subscribed_user,
+    get_token,
+    remember_user_id,
+)
 from app.models.user import User
 from app.schemas.user import UserOut, UserOutFull, UserUpdate
 
@@ -27,7 +32,9 @@ def get_users(
     users = (
         db.query(User)
         .options(
-            joinedload(User.tasks), joinedload(User.notes), joinedload(User.backlogs)
+            selectinload(User.tasks),
+            selectinload(User.notes),
+            selectinload(User.backlogs),
         )
         .order_by(User.id)
         .all()
@@ -44,7 +51,9 @@ def get_user_with_data(user_id: int, db: Session = Depends(get_db)):
     user = (
         db.query(User)
         .options(
-            joinedload(User.tasks), joinedload(User.notes), joinedload(User.backlogs)
+            selectinload(User.tasks),
+            selectinload(User.notes),
+            selectinload(User.backlogs),
         )
         .filter(User.id == user_id)
         .first()
@@ -69,7 +78,7 @@ def get_current_user(
     name = decoded_token.get("name")
 
     # Check if the user exists by Firebase UID
-    user = db.query(User).filter(User.firebase_uid == firebase_uid).first()
+    user = find_user_by_firebase_uid(db, firebase_uid)
     if user:
         return user
 
@@ -83,6 +92,7 @@ def get_current_user(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    remember_user_id(new_user)
 
     print(f"New user created: {new_user}")
     return new_user
@@ -6,6 +6,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 
 from app.core.database import SessionLocal
 from app.models.note import Note
+from app.routes.stripe import retry_stored_events
 
 
 def delete_empty_notes():
@@ -15,11 +16,11 @@ def delete_empty_notes():
     db = SessionLocal()
 
     try:
-        empty_notes = db.query(Note).filter(Note.entry == "").all()
-        for note in empty_notes:
-            db.delete(note)
+        deleted = (
+            db.query(Note).filter(Note.entry == "").delete(synchronize_session=False)
+        )
         db.commit()
-        print(f"{datetime.now()}: Deleted {len(empty_notes)} empty notes.")
+        print(f"{datetime.now()}: Deleted {deleted} empty notes.")
     except Exception as e:
         db.rollback()
         print(f"Error deleting empty notes: {e}")
@@ -27,11 +28,21 @@ def delete_empty_notes():
         db.close()
 
 
+def retry_stripe_events():
+    """
+    Retries Stripe webhook events that failed to apply.
+    """
+    retried = retry_stored_events()
+    if retried:
+        print(f"{datetime.now()}: Retried {retried} Stripe events.")
+
+
 def start_scheduler():
     """
-    Initializes the APScheduler and schedules the delete_empty_notes job
-    to run every day at midnight.
+    Initializes the APScheduler, schedules the delete_empty_notes job to run
+    every day at midnight and retries failed Stripe events every 10 minutes.
     """
     scheduler = BackgroundScheduler()
     scheduler.add_job(delete_empty_notes, "cron", hour=0, minute=0)
+    scheduler.add_job(retry_stripe_events, "interval", minutes=10)
     scheduler.start()
@@ -0,0 +1,47 @@
+import stripe
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.routes.stripe import refresh_subscription_details
+
+"""
+One-off script to fill the subscription details stored on users.
+Subscribers from before those columns existed have no plan, price or renewal
+date until a webhook arrives; this reads them from Stripe once.
+Run this once after migrating: `python -m app.scripts.backfill_subscription_details`
+"""
+
+
+def backfill_subscription_details(db: Session) -> int:
+    """
+    Stores the Stripe subscription details of every subscriber still missing
+    them and returns how many users were filled.
+    """
+    users = (
+        db.query(User)
+        .filter(User.stripe_subscription_id.is_not(None), User.plan_name.is_(None))
+        .all()
+    )
+
+    filled = 0
+    for user in users:
+        # Commit per user so one Stripe error does not undo the others
+        try:
+            refresh_subscription_details(user)
+            db.commit()
+            filled += 1
+        except stripe.StripeError as e:
+            db.rollback()
+            print(f"Skipping user {user.id}: {e}")
+
+    return filled
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        filled = backfill_subscription_details(db)
+        print(f"✅ Backfilled subscription details for {filled} users.")
+    finally:
+        db.close()
@@ -1,4 +1,10 @@
+import hashlib
+import time
+from functools import lru_cache
+from threading import Lock
+
 import firebase_admin
+from cachetools import TTLCache
 from firebase_admin import auth as firebase_auth
 from firebase_admin import credentials
 
@@ -15,25 +21,67 @@ from app.core.config import (
     FIREBASE_TYPE,
 )
 
-# Construct Firebase credentials from environment variables
-firebase_credentials = {
-    "type": FIREBASE_TYPE,
-    "project_id": FIREBASE_PROJECT_ID,
-    "private_key_id": FIREBASE_PRIVATE_KEY_ID,
-    "private_key": FIREBASE_PRIVATE_KEY,
-    "client_email": FIREBASE_CLIENT_EMAIL,
-    "client_id": FIREBASE_CLIENT_ID,
-    "auth_uri": FIREBASE_AUTH_URI,
-    "token_uri": FIREBASE_TOKEN_URI,
-    "auth_provider_x509_cert_url": FIREBASE_AUTH_PROVIDER_CERT_URL,
-    "client_x509_cert_url": FIREBASE_CLIENT_CERT_URL,
-}
-
-# Check if Firebase Admin has already been initialized to prevent reinitialization errors.
-if not firebase_admin._apps:
-    cred = credentials.Certificate(firebase_credentials)
-    firebase_admin.initialize_app(cred)
+# Verified tokens keyed by a SHA-256 prefix (Firebase ID tokens live 1 hour)
+_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+_token_cache_lock = Lock()
+
+
+@lru_cache(maxsize=1)
+def get_credential() -> credentials.Certificate:
+    """
+    Builds the Firebase credential from environment variables, parsing the key once.
+    """
+    return credentials.Certificate(
+        {
+            "type": FIREBASE_TYPE,
+            "project_id": FIREBASE_PROJECT_ID,
+            "private_key_id": FIREBASE_PRIVATE_KEY_ID,
+            "private_key": FIREBASE_PRIVATE_KEY,
+            "client_email": FIREBASE_CLIENT_EMAIL,
+            "client_id": FIREBASE_CLIENT_ID,
+            "auth_uri": FIREBASE_AUTH_URI,
+            "token_uri": FIREBASE_TOKEN_URI,
+            "auth_provider_x509_cert_url": FIREBASE_AUTH_PROVIDER_CERT_URL,
+            "client_x509_cert_url": FIREBASE_CLIENT_CERT_URL,
+        }
+    )
+
+
+def init_firebase_app() -> None:
+    """
+    Initializes Firebase Admin on first use.
+    """
+    # Check if Firebase Admin has already been initialized to prevent reinitialization errors.
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(get_credential())
+
+
+def verify_id_token_cached(token: str) -> dict:
+    """
+    Verifies the Firebase token, reusing the result until the token expires.
+    """
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    with _token_cache_lock:
+        decoded_token = _token_cache.get(key)
+
+    if decoded_token and decoded_token["exp"] > time.time():
+        return decoded_token
+
+    init_firebase_app()
+    decoded_token = firebase_auth.verify_id_token(token)
+
+    # Only cache tokens that carry an expiry
+    if "exp" in decoded_token:
+        with _token_cache_lock:
+            _token_cache[key] = decoded_token
+
+    return decoded_token
 
 
 # Re-export firebase_auth for convenience in other modules.
-__all__ = ["firebase_auth"]
+__all__ = [
+    "firebase_auth",
+    "get_credential",
+    "init_firebase_app",
+    "verify_id_token_cached",
+]
@@ -0,0 +1,84 @@
+from threading import Lock
+
+import stripe
+from cachetools import TTLCache
+
+# Subscriptions change through webhooks, so keep them briefly and drop them on events
+_subscription_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
+# Prices (with their product expanded) are effectively immutable
+_price_cache: TTLCache = TTLCache(maxsize=1_000, ttl=86_400)
+
+# Webhook event IDs already accepted; Stripe retries within a few days at most
+_seen_event_cache: TTLCache = TTLCache(maxsize=100_000, ttl=86_400)
+
+_cache_lock = Lock()
+
+
+def get_or_fetch_subscription(subscription_id: str):
+    """
+    Retrieves a Stripe subscription, reusing a cached copy for up to 5 minutes.
+    """
+    with _cache_lock:
+        subscription = _subscription_cache.get(subscription_id)
+    if subscription is not None:
+        return subscription
+
+    subscription = stripe.Subscription.retrieve(subscription_id)
+
+    with _cache_lock:
+        _subscription_cache[subscription_id] = subscription
+    return subscription
+
+
+def get_or_fetch_price(price_id: str):
+    """
+    Retrieves a Stripe price with its product, reusing a cached copy for a day.
+    """
+    with _cache_lock:
+        price = _price_cache.get(price_id)
+    if price is not None:
+        return price
+
+    price = stripe.Price.retrieve(price_id, expand=["product"])
+
+    with _cache_lock:
+        _price_cache[price_id] = price
+    return price
+
+
+def invalidate_subscription(subscription_id: str) -> None:
+    """
+    Drops the cached copy of a Stripe subscription.
+    """
+    with _cache_lock:
+        _subscription_cache.pop(subscription_id, None)
+
+
+def mark_event_seen(event_id: str) -> bool:
+    """
+    Records a webhook event ID, returning False if it was already recorded.
+    """
+    with _cache_lock:
+        if event_id in _seen_event_cache:
+            return False
+        _seen_event_cache[event_id] = True
+    return True
+
+
+def forget_event(event_id: str) -> None:
+    """
+    Drops a recorded webhook event ID so a retry of the event is processed.
+    """
+    with _cache_lock:
+        _seen_event_cache.pop(event_id, None)
+
+
+def clear_stripe_cache() -> None:
+    """
+    Drops every cached subscription, price and webhook event ID.
+    """
+    with _cache_lock:
+        _subscription_cache.clear()
+        _price_cache.clear()
+        _seen_event_cache.clear()
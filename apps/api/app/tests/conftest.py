@@ -1,148 +1,213 @@
 import os
+from functools import partial
+from unittest.mock import Mock
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, event, insert
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from app.core.database import Base, get_db
-from app.deps.auth import get_subscribed_user, get_token, get_user
-from app.main import app
-from app.models.user import User
+# Force in-memory SQLite for tests before the app reads DATABASE_URL; the
+# database lives in this process, so every xdist worker gets its own copy
+TEST_DATABASE_URL = "sqlite://"
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
 
-# Force SQLite for tests - override any environment DATABASE_URL
-os.environ["DATABASE_URL"] = "sqlite:///file::memory:?cache=shared"
-TEST_DATABASE_URL = "sqlite:///file::memory:?cache=shared"
+from app.core.database import Base, get_db  # noqa: E402
+from app.deps.auth import get_subscribed_user, get_token, get_user  # noqa: E402
+from app.deps.rate_limit import limiters  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
 
-# Create a new engine and session for each test
+# One in-memory database shared through a single connection
 engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    pool_pre_ping=True,
+    poolclass=StaticPool,
 )
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-# Override FastAPI dependencies
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Let SQLAlchemy own transactions so SAVEPOINTs work with pysqlite
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _emit_begin(connection):
+    connection.exec_driver_sql("BEGIN")
+
+
+# Authenticated identity shared by every overridden request
+SEED_USER = {
+    "id": 1,
+    "firebase_uid": "test-firebase-uid",
+    "name": "Test User",
+    "email": "test@example.com",
+    "is_subscribed": True,
+}
 
+TEST_USER = User(**SEED_USER)
+SEED_USER_INSERT = insert(User).values(**SEED_USER)
 
+TEST_TOKEN = {
+    "uid": "test-firebase-uid",
+    "email": "test@example.com",
+    "name": "Test User",
+}
+
+
+# Override FastAPI dependencies
 def override_get_user():
-    return User(
-        id=1,
-        firebase_uid="test-firebase-uid",
-        name="Test User",
-        email="test@example.com",
-        is_subscribed=True,
-    )
+    return TEST_USER
 
 
 def override_get_subscribed_user():
-    return User(
-        id=1,
-        firebase_uid="test-firebase-uid",
-        name="Test User",
-        email="test@example.com",
-        is_subscribed=True,
-    )
+    return TEST_USER
 
 
 def override_get_token():
-    return {
-        "uid": "test-firebase-uid",
-        "email": "test@example.com",
-        "name": "Test User",
-    }
+    return TEST_TOKEN
+
 
+# Overrides installed for the whole session
+DEPENDENCY_OVERRIDES = {
+    get_user: override_get_user,
+    get_subscribed_user: override_get_subscribed_user,
+    get_token: override_get_token,
+}
 
-# Create tables before running tests
+
+# Create the schema once; tests roll back their own data
 @pytest.fixture(scope="session", autouse=True)
-def setup_database():
+def _schema():
     Base.metadata.create_all(bind=engine)
     yield
-    Base.metadata.drop_all(bind=engine)
+    # The in-memory database disappears with its connection
+    engine.dispose()
 
 
-# Setup and teardown dependency overrides
-@pytest.fixture(scope="session", autouse=True)
+# Reinstall the default overrides around every test so the shared client never
+# carries an override left behind by an earlier test
+@pytest.fixture(autouse=True)
 def setup_dependency_overrides():
     # Set up overrides
-    app.dependency_overrides[get_db] = override_get_db
-    app.dependency_overrides[get_user] = override_get_user
-    app.dependency_overrides[get_subscribed_user] = override_get_subscribed_user
-    app.dependency_overrides[get_token] = override_get_token
+    app.dependency_overrides.update(DEPENDENCY_OVERRIDES)
     yield
     # Clean up overrides
     app.dependency_overrides.clear()
 
 
-# Provide a new client for each test with clean database
-@pytest.fixture
-def client():
-    # Create a new engine and session for each test to ensure isolation
-    test_engine = create_engine(
-        TEST_DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        pool_pre_ping=True,
-    )
-    TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+# Never initialize the real Firebase app; token checks are patched per test
+@pytest.fixture(autouse=True)
+def skip_firebase_init(monkeypatch):
+    monkeypatch.setattr("app.services.firebase_admin.init_firebase_app", lambda: None)
 
-    def override_get_db():
-        db = TestSessionLocal()
-        try:
-            yield db
-        finally:
-            db.close()
 
-    # Clean slate for each test
-    Base.metadata.drop_all(bind=test_engine)
-    Base.metadata.create_all(bind=test_engine)
+# Start every test with fresh rate-limit counters
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    for limiter in limiters:
+        limiter.reset()
+    yield
 
-    # Override the database dependency
-    original_override = app.dependency_overrides.get(get_db)
-    app.dependency_overrides[get_db] = override_get_db
+
+# Give each test one connection whose outer transaction is rolled back afterwards
+@pytest.fixture
+def db_session():
+    connection = engine.connect()
+    transaction = connection.begin()
+
+    # Commits inside the app only release a SAVEPOINT on this connection
+    session = TestingSessionLocal(
+        bind=connection, join_transaction_mode="create_savepoint"
+    )
 
     try:
-        yield TestClient(app)
+        yield session
     finally:
-        # Restore original override if it existed
-        if original_override:
-            app.dependency_overrides[get_db] = original_override
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+# Route the app's database dependency to the test's session
+@pytest.fixture
+def db_override(db_session, monkeypatch):
+    def override_get_db():
+        yield db_session
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+
+    # Background jobs open their own session; keep it on the test's connection
+    monkeypatch.setattr(
+        "app.routes.stripe.SessionLocal",
+        partial(
+            TestingSessionLocal,
+            bind=db_session.bind,
+            join_transaction_mode="create_savepoint",
+        ),
+    )
+
+
+# Let tests drop or replace an override, e.g. to exercise real auth; the
+# original override comes back at teardown
+@pytest.fixture
+def override_dep(monkeypatch):
+    def _apply(dependency, override=None):
+        if override is None:
+            monkeypatch.delitem(app.dependency_overrides, dependency, raising=False)
         else:
-            app.dependency_overrides.pop(get_db, None)
-        # Clean up
-        Base.metadata.drop_all(bind=test_engine)
-        test_engine.dispose()
+            monkeypatch.setitem(app.dependency_overrides, dependency, override)
+
+    return _apply
+
+
+# Build the test client once; isolation comes from the SAVEPOINT rollback
+@pytest.fixture(scope="session")
+def _test_client():
+    return TestClient(app)
+
+
+# Hand the shared client to each test with its own database session routed in
+@pytest.fixture
+def client(_test_client, db_override):
+    return _test_client
+
+
+# Run async tests on asyncio through the anyio plugin, reusing one event loop
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+# Call the ASGI app in-process, without TestClient's worker thread
+@pytest.fixture
+async def async_client(db_override):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
 
 
 # Create new user for each test
 @pytest.fixture
-def seeded_client(client):
-    # Get a test database session
-    test_engine = create_engine(
-        TEST_DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        pool_pre_ping=True,
-    )
-    TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
-    db = TestSessionLocal()
-    try:
-        db.add(
-            User(
-                id=1,
-                firebase_uid="test-firebase-uid",
-                name="Test User",
-                email="test@example.com",
-                is_subscribed=True,
-            )
-        )
-        db.commit()
-    finally:
-        db.close()
+def seeded_client(client, db_session):
+    # A prebuilt Core insert; the row goes away with the test's rollback
+    db_session.execute(SEED_USER_INSERT)
+    db_session.commit()
     return client
+
+
+# Authenticated user for calling route functions directly
+@pytest.fixture
+def mock_user():
+    return TEST_USER
+
+
+# Bare session stand-in for calling route functions directly
+@pytest.fixture
+def mock_db():
+    return Mock()
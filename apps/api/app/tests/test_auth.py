@@ -1,20 +1,40 @@
+import time
 from unittest.mock import Mock, patch
 
 import pytest
-from fastapi import HTTPException
+from fastapi import HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials
 from firebase_admin import auth as firebase_auth
 
-from app.deps.auth import get_subscribed_user, get_user
+from app.deps.auth import get_subscribed_user, get_token, get_user
 from app.models.user import User
+from app.services.firebase_admin import verify_id_token_cached
+
+
+class StubDB:
+    """Minimal session that always resolves to the given user"""
+
+    def __init__(self, user=None):
+        self._user = user
+
+    def query(self, *_):
+        return self
+
+    def filter(self, *_):
+        return self
+
+    def first(self):
+        return self._user
+
+    def get(self, *_):
+        return self._user
 
 
 class TestAuthentication:
     """Test suite for authentication functionality"""
 
-    @patch("app.deps.auth.firebase_auth.verify_id_token")
-    @patch("app.deps.auth.get_db")
-    def test_get_user_success(self, mock_get_db, mock_verify_token):
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
+    def test_get_user_success(self, mock_verify_token):
         """Test successful user retrieval"""
         # Mock Firebase response
         mock_verify_token.return_value = {
@@ -23,10 +43,7 @@ class TestAuthentication:
             "name": "Test User",
         }
 
-        # Mock database session and user
-        mock_db = Mock()
-        mock_get_db.return_value = mock_db
-
+        # Stub database session and user
         mock_user = User(
             id=1,
             firebase_uid="firebase_uid_123",
@@ -34,7 +51,7 @@ class TestAuthentication:
             name="Test User",
             is_subscribed=True,
         )
-        mock_db.query.return_value.filter.return_value.first.return_value = mock_user
+        mock_db = StubDB(mock_user)
 
         # Create mock credentials
         mock_credentials = HTTPAuthorizationCredentials(
@@ -47,14 +64,12 @@ class TestAuthentication:
         assert result == mock_user
         mock_verify_token.assert_called_once_with("valid_token")
 
-    @patch("app.deps.auth.firebase_auth.verify_id_token")
-    @patch("app.deps.auth.get_db")
-    def test_get_user_invalid_token(self, mock_get_db, mock_verify_token):
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
+    def test_get_user_invalid_token(self, mock_verify_token):
         """Test user retrieval with invalid token"""
         mock_verify_token.side_effect = Exception("Invalid token")
 
-        mock_db = Mock()
-        mock_get_db.return_value = mock_db
+        mock_db = StubDB()
         mock_credentials = HTTPAuthorizationCredentials(
             scheme="Bearer", credentials="invalid_token"
         )
@@ -65,9 +80,8 @@ class TestAuthentication:
         assert exc_info.value.status_code == 401
         assert "Invalid or expired token" in str(exc_info.value.detail)
 
-    @patch("app.deps.auth.firebase_auth.verify_id_token")
-    @patch("app.deps.auth.get_db")
-    def test_get_user_not_found(self, mock_get_db, mock_verify_token):
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
+    def test_get_user_not_found(self, mock_verify_token):
         """Test user retrieval when user doesn't exist in database"""
         # Mock Firebase response
         mock_verify_token.return_value = {
@@ -76,10 +90,8 @@ class TestAuthentication:
             "name": "Nonexistent User",
         }
 
-        # Mock database session with no user found
-        mock_db = Mock()
-        mock_get_db.return_value = mock_db
-        mock_db.query.return_value.filter.return_value.first.return_value = None
+        # Stub database session with no user found
+        mock_db = StubDB()
 
         mock_credentials = HTTPAuthorizationCredentials(
             scheme="Bearer", credentials="valid_token"
@@ -91,8 +103,7 @@ class TestAuthentication:
         assert exc_info.value.status_code == 404
         assert "User not found" in str(exc_info.value.detail)
 
-    @patch("app.deps.auth.get_user")
-    def test_get_subscribed_user_success(self, mock_get_user):
+    def test_get_subscribed_user_success(self):
         """Test successful subscribed user retrieval"""
         mock_user = User(
             id=1,
@@ -101,19 +112,12 @@ class TestAuthentication:
             name="Test User",
             is_subscribed=True,
         )
-        mock_get_user.return_value = mock_user
-
-        mock_credentials = HTTPAuthorizationCredentials(
-            scheme="Bearer", credentials="valid_token"
-        )
-        mock_db = Mock()
 
-        result = get_subscribed_user(mock_credentials, mock_db)
+        result = get_subscribed_user(mock_user)
 
         assert result == mock_user
 
-    @patch("app.deps.auth.get_user")
-    def test_get_subscribed_user_not_subscribed(self, mock_get_user):
+    def test_get_subscribed_user_not_subscribed(self):
         """Test subscribed user retrieval for non-subscribed user"""
         mock_user = User(
             id=1,
@@ -122,27 +126,16 @@ class TestAuthentication:
             name="Test User",
             is_subscribed=False,
         )
-        mock_get_user.return_value = mock_user
-
-        mock_credentials = HTTPAuthorizationCredentials(
-            scheme="Bearer", credentials="valid_token"
-        )
-        mock_db = Mock()
 
         with pytest.raises(HTTPException) as exc_info:
-            get_subscribed_user(mock_credentials, mock_db)
+            get_subscribed_user(mock_user)
 
         assert exc_info.value.status_code == 402
         assert "not subscribed" in str(exc_info.value.detail)
 
-    @patch("app.deps.auth.firebase_auth.verify_id_token")
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
     def test_get_token_firebase_exception(self, mock_verify_token):
         """Test Firebase token verification exception handling"""
-        from fastapi import HTTPException
-        from fastapi.security import HTTPAuthorizationCredentials
-
-        from app.deps.auth import get_token
-
         # Mock Firebase to raise an exception
         mock_verify_token.side_effect = Exception("Firebase verification failed")
 
@@ -158,14 +151,9 @@ class TestAuthentication:
         assert exc_info.value.status_code == 401
         assert "Invalid or expired token" in str(exc_info.value.detail)
 
-    @patch("app.deps.auth.firebase_auth.verify_id_token")
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
     def test_get_token_firebase_exception_http_exception(self, mock_verify):
         """Test HTTPException is raised when Firebase verification fails"""
-        from fastapi import HTTPException, status
-        from fastapi.security import HTTPAuthorizationCredentials
-
-        from app.deps.auth import get_token
-
         # Mock Firebase to raise exception
         mock_verify.side_effect = Exception("Firebase verification failed")
 
@@ -182,103 +170,116 @@ class TestAuthentication:
         assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
         assert "Invalid or expired token" in str(exc_info.value.detail)
 
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
+    def test_get_user_cached_uid_uses_primary_key(self, mock_verify_token):
+        """Test a previously resolved UID loads the user by primary key"""
+        mock_verify_token.return_value = {"uid": "firebase_uid_cached"}
+
+        mock_user = User(
+            id=7,
+            firebase_uid="firebase_uid_cached",
+            email="cached@example.com",
+            name="Cached User",
+            is_subscribed=True,
+        )
+        mock_db = Mock()
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_user
+        mock_db.get.return_value = mock_user
+
+        mock_credentials = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials="cached_uid_token"
+        )
+
+        assert get_user(mock_credentials, mock_db) == mock_user
+        assert get_user(mock_credentials, mock_db) == mock_user
+
+        mock_db.query.assert_called_once()
+        mock_db.get.assert_called_once_with(User, 7)
+
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
+    def test_verify_token_cached_until_expiry(self, mock_verify_token):
+        """Test a verified token is reused until it expires"""
+        mock_verify_token.return_value = {
+            "uid": "firebase_uid_123",
+            "exp": time.time() + 3600,
+        }
+
+        first = verify_id_token_cached("cached_token")
+        second = verify_id_token_cached("cached_token")
+
+        assert first == second
+        mock_verify_token.assert_called_once_with("cached_token")
+
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
+    def test_verify_token_expired_is_reverified(self, mock_verify_token):
+        """Test an expired cached token is verified again"""
+        mock_verify_token.return_value = {
+            "uid": "firebase_uid_123",
+            "exp": time.time() - 1,
+        }
+
+        verify_id_token_cached("expired_token")
+        verify_id_token_cached("expired_token")
+
+        assert mock_verify_token.call_count == 2
 
+
+@pytest.mark.anyio
 class TestAuthenticationIntegration:
     """Integration tests for authentication with actual FastAPI client"""
 
-    def test_protected_endpoint_no_auth(self, client):
+    async def test_protected_endpoint_no_auth(self, async_client, override_dep):
         """Test accessing protected endpoint without authentication"""
         # Temporarily remove auth overrides to test real auth behavior
-        from app.deps.auth import get_user
-        from app.main import app
-
-        # Remove the override temporarily
-        original_override = app.dependency_overrides.get(get_user)
-        if get_user in app.dependency_overrides:
-            del app.dependency_overrides[get_user]
-
-        try:
-            response = client.get("/tasks/")
-            assert response.status_code == 403
-            assert "Not authenticated" in response.json()["detail"]
-        finally:
-            # Restore the override
-            if original_override:
-                app.dependency_overrides[get_user] = original_override
-
-    def test_protected_endpoint_invalid_auth(self, client):
+        override_dep(get_user)
+        response = await async_client.get("/tasks/")
+        assert response.status_code == 403
+        assert "Not authenticated" in response.json()["detail"]
+
+    async def test_protected_endpoint_invalid_auth(self, async_client, override_dep):
         """Test accessing protected endpoint with invalid authentication"""
         # Temporarily remove auth overrides to test real auth behavior
-        from app.deps.auth import get_user
-        from app.main import app
-
-        # Remove the override temporarily
-        original_override = app.dependency_overrides.get(get_user)
-        if get_user in app.dependency_overrides:
-            del app.dependency_overrides[get_user]
-
-        try:
-            response = client.get(
-                "/tasks/", headers={"Authorization": "InvalidFormat token"}
-            )
-            assert response.status_code == 403
-            assert "Invalid authentication credentials" in response.json()["detail"]
-        finally:
-            # Restore the override
-            if original_override:
-                app.dependency_overrides[get_user] = original_override
-
-    @patch("app.deps.auth.firebase_auth.verify_id_token")
-    def test_protected_endpoint_valid_auth(self, mock_verify_token, client):
+        override_dep(get_user)
+        response = await async_client.get(
+            "/tasks/", headers={"Authorization": "InvalidFormat token"}
+        )
+        assert response.status_code == 403
+        assert "Invalid authentication credentials" in response.json()["detail"]
+
+    @patch("app.services.firebase_admin.firebase_auth.verify_id_token")
+    async def test_protected_endpoint_valid_auth(
+        self, mock_verify_token, async_client, override_dep
+    ):
         """Test accessing protected endpoint with valid authentication"""
         # Temporarily remove auth overrides to test real auth behavior
-        from app.deps.auth import get_user
-        from app.main import app
-
-        # Remove the override temporarily
-        original_override = app.dependency_overrides.get(get_user)
-        if get_user in app.dependency_overrides:
-            del app.dependency_overrides[get_user]
-
-        try:
-            # Mock Firebase verification
-            mock_verify_token.return_value = {
-                "uid": "test_uid",
-                "email": "test@example.com",
-                "name": "Test User",
-            }
-
-            # This will still fail because the user doesn't exist in the test database,
-            # but it shows the auth flow is working
-            response = client.get(
-                "/tasks/", headers={"Authorization": "Bearer valid_token"}
-            )
-            assert response.status_code == 404  # User not found in database
-            assert "User not found" in response.json()["detail"]
-        finally:
-            # Restore the override
-            if original_override:
-                app.dependency_overrides[get_user] = original_override
-
-    def test_subscription_required_endpoint_no_subscription(self, client):
+        override_dep(get_user)
+        # Mock Firebase verification
+        mock_verify_token.return_value = {
+            "uid": "test_uid",
+            "email": "test@example.com",
+            "name": "Test User",
+        }
+
+        # This will still fail because the user doesn't exist in the test database,
+        # but it shows the auth flow is working
+        response = await async_client.get(
+            "/tasks/", headers={"Authorization": "Bearer valid_token"}
+        )
+        assert response.status_code == 404  # User not found in database
+        assert "User not found" in response.json()["detail"]
+
+    async def test_subscription_required_endpoint_no_subscription(
+        self, async_client, override_dep
+    ):
         """Test accessing subscription-required endpoint without subscription"""
         # This test uses the overridden user which is subscribed, so we need to
         # temporarily override with an unsubscribed user
-        from app.deps.auth import get_subscribed_user
-        from app.main import app
 
         def mock_unsubscribed_user():
             raise HTTPException(status_code=402, detail="User is not subscribed")
 
         # Override with unsubscribed user
-        original_override = app.dependency_overrides.get(get_subscribed_user)
-        app.dependency_overrides[get_subscribed_user] = mock_unsubscribed_user
-
-        try:
-            response = client.post("/api/stripe/cancel-subscription")
-            assert response.status_code == 402
-            assert "not subscribed" in response.json()["detail"]
-        finally:
-            # Restore original override
-            if original_override:
-                app.dependency_overrides[get_subscribed_user] = original_override
+        override_dep(get_subscribed_user, mock_unsubscribed_user)
+        response = await async_client.post("/api/stripe/cancel-subscription")
+        assert response.status_code == 402
+        assert "not subscribed" in response.json()["detail"]
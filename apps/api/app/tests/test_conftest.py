@@ -1,9 +1,5 @@
 """Tests for conftest.py functions to achieve 100% coverage"""
 
-from unittest.mock import Mock, patch
-
-import pytest
-
 
 def test_conftest_override_functions():
     """Test the override functions to cover app/tests/conftest.py"""
@@ -21,35 +17,8 @@ def test_conftest_override_functions():
     assert subscribed_user.is_subscribed is True
 
 
-def test_conftest_seeded_client_cleanup():
-    """Test the seeded_client fixture cleanup to cover missing line 108"""
-    from unittest.mock import patch
-
-    from app.core.database import get_db
-    from app.main import app
-    from app.tests.conftest import Base, TestingSessionLocal, engine, seeded_client
-
-    # Mock the scenario where there's an original override to restore
-    mock_original_override = Mock()
-
-    # Test the cleanup logic that restores original override
-    with patch.dict(app.dependency_overrides, {get_db: mock_original_override}):
-        # This should trigger the cleanup code in seeded_client fixture
-        # The fixture will save the original override and restore it
-
-        # Create a mock request to trigger the fixture
-        class MockRequest:
-            pass
-
-        mock_request = MockRequest()
-
-        # We can't easily test the fixture directly, but we can test the logic
-        # that the fixture uses for cleanup
-        original_override = app.dependency_overrides.get(get_db)
-        if original_override:
-            # This covers line 108 in conftest.py
-            app.dependency_overrides[get_db] = original_override
-        else:
-            app.dependency_overrides.pop(get_db, None)
-
-        assert True  # Test passes if no exception is raised
+def test_seeded_user_visible(seeded_client):
+    """Test the seeded_client fixture stores the overridden user in the database"""
+    response = seeded_client.get("/users/get_current")
+    assert response.status_code == 200
+    assert response.json()["email"] == "test@example.com"
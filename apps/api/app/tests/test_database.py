@@ -5,10 +5,16 @@ Test suite for database core functionality
 from unittest.mock import Mock, patch
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from app.core.database import Base, SessionLocal, get_db
+from app.core.database import Base, SessionLocal, engine, get_db
+
+
+@pytest.fixture(scope="module")
+def session():
+    """One SessionLocal session shared by the tests that only inspect it"""
+    session = SessionLocal()
+    yield session
+    session.close()
 
 
 class TestDatabase:
@@ -71,20 +77,15 @@ class TestDatabase:
         # Verify close was called even if there was an exception
         mock_session.close.assert_called_once()
 
-    def test_sessionlocal_configuration(self):
+    def test_sessionlocal_configuration(self, session):
         """Test SessionLocal is properly configured"""
         # Verify SessionLocal creates working sessions
-        session = SessionLocal()
-
         assert session is not None
         assert hasattr(session, "query")
         assert hasattr(session, "add")
         assert hasattr(session, "commit")
         assert hasattr(session, "rollback")
 
-        # Clean up
-        session.close()
-
     def test_base_declarative_base(self):
         """Test that Base is properly configured as declarative base"""
         # Verify Base has the expected methods and attributes
@@ -96,43 +97,36 @@ class TestDatabase:
 
     def test_database_connection_properties(self):
         """Test database engine and connection properties"""
-        from app.core.database import engine
-
         # Verify engine exists and has expected properties
         assert engine is not None
         assert hasattr(engine, "connect")
         # Note: modern SQLAlchemy engines don't have direct execute method
 
+        # In-memory SQLite cannot go stale, so no pre-ping per checkout
+        assert engine.pool._pre_ping is False
+
         # Test connection can be established
         with engine.connect() as conn:
             assert conn is not None
 
-    def test_session_transaction_behavior(self):
+    def test_session_transaction_behavior(self, session):
         """Test session transaction behavior"""
-        session = SessionLocal()
-
-        try:
-            # Test that session supports transactions
-            assert hasattr(session, "begin")
-            assert hasattr(session, "commit")
-            assert hasattr(session, "rollback")
-
-        finally:
-            session.close()
+        # Test that session supports transactions
+        assert hasattr(session, "begin")
+        assert hasattr(session, "commit")
+        assert hasattr(session, "rollback")
 
-    def test_multiple_sessions_independence(self):
+    def test_multiple_sessions_independence(self, session):
         """Test that multiple sessions are independent"""
-        session1 = SessionLocal()
-        session2 = SessionLocal()
+        other_session = SessionLocal()
 
         try:
             # Verify they are different objects
-            assert session1 is not session2
+            assert session is not other_session
 
             # Verify they have independent state
             # (This is a basic check - in a real scenario you'd test with actual data)
-            assert session1.get_bind() == session2.get_bind()  # Same engine
+            assert session.get_bind() == other_session.get_bind()  # Same engine
 
         finally:
-            session1.close()
-            session2.close()
+            other_session.close()
@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from app.deps.rate_limit import RateLimiter, checkout_limiter, limit_by_ip
+
+
+def test_rate_limiter_allows_up_to_limit():
+    limiter = RateLimiter(times=3)
+
+    for _ in range(3):
+        limiter.hit("user-1")
+
+    with pytest.raises(HTTPException) as exc_info:
+        limiter.hit("user-1")
+
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers is not None
+    assert "Retry-After" in exc_info.value.headers
+
+
+def test_rate_limiter_counts_keys_separately():
+    limiter = RateLimiter(times=1)
+
+    limiter.hit("user-1")
+    limiter.hit("user-2")
+
+    with pytest.raises(HTTPException):
+        limiter.hit("user-1")
+
+
+def test_rate_limiter_charges_cost():
+    limiter = RateLimiter(times=3)
+
+    limiter.hit("user-1", cost=3)
+
+    with pytest.raises(HTTPException):
+        limiter.hit("user-1")
+
+
+def test_rate_limiter_resets_in_next_window():
+    limiter = RateLimiter(times=1, seconds=60)
+
+    with patch("app.deps.rate_limit.time.time", return_value=120.0):
+        limiter.hit("user-1")
+        with pytest.raises(HTTPException):
+            limiter.hit("user-1")
+
+    with patch("app.deps.rate_limit.time.time", return_value=180.0):
+        limiter.hit("user-1")
+
+
+def test_checkout_route_is_rate_limited(seeded_client):
+    with patch.object(checkout_limiter, "times", 0):
+        response = seeded_client.post(
+            "/api/stripe/create-checkout-session",
+            json={
+                "price_id": "price_test123",
+                "mode": "subscription",
+                "success_url": "https://example.com/success",
+                "cancel_url": "https://example.com/cancel",
+            },
+        )
+
+    assert response.status_code == 429
+    assert response.json()["detail"] == "Too many requests"
+
+
+def build_ip_limited_client(trusted_hosts):
+    limiter = RateLimiter(times=1)
+    app = FastAPI()
+    app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=trusted_hosts)
+
+    @app.get("/", dependencies=[Depends(limit_by_ip(limiter))])
+    def index():
+        return {}
+
+    return TestClient(app)
+
+
+def test_limit_by_ip_keys_on_trusted_forwarded_for():
+    client = build_ip_limited_client("testclient")
+
+    first = client.get("/", headers={"X-Forwarded-For": "203.0.113.1"})
+    other = client.get("/", headers={"X-Forwarded-For": "203.0.113.2"})
+    again = client.get("/", headers={"X-Forwarded-For": "203.0.113.1"})
+
+    assert first.status_code == 200
+    assert other.status_code == 200
+    assert again.status_code == 429
+
+
+def test_limit_by_ip_ignores_untrusted_forwarded_for():
+    client = build_ip_limited_client("127.0.0.1")
+
+    first = client.get("/", headers={"X-Forwarded-For": "203.0.113.1"})
+    spoofed = client.get("/", headers={"X-Forwarded-For": "203.0.113.2"})
+
+    assert first.status_code == 200
+    assert spoofed.status_code == 429
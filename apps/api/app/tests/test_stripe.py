@@ -1,512 +1,589 @@
 import json
-from contextlib import contextmanager
-from unittest.mock import ANY, Mock, patch
+from datetime import datetime, timedelta
+from unittest.mock import ANY, MagicMock, Mock, patch
 
 import pytest
 import stripe
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from app.core.database import Base
+from app.deps.auth import get_subscribed_user, get_token, get_user
+from app.main import app
+from app.models.stripe_event import StripeEvent
 from app.models.user import User
-
-# Set up test database
-TEST_DATABASE_URL = "sqlite:///file::memory:?cache=shared"
-engine = create_engine(
-    TEST_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    pool_pre_ping=True,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.routes.stripe import retry_stored_events
+from app.scripts.backfill_subscription_details import backfill_subscription_details
+from app.services.stripe_cache import _subscription_cache, clear_stripe_cache
+
+
+@pytest.fixture(autouse=True)
+def reset_stripe_cache():
+    """Start every test without cached Stripe objects"""
+    clear_stripe_cache()
+    yield
+    clear_stripe_cache()
+
+
+# Webhook request sent by every webhook test; the event comes from the stub
+WEBHOOK_BODY = b'{"test":"data"}'
+WEBHOOK_HEADERS = {"stripe-signature": "test_sig", "content-type": "application/json"}
+
+# Errors raised by the stubbed SDK; Mock raises side_effect instances as-is
+CUSTOMER_ERROR = stripe.StripeError("Customer creation failed")
+SESSION_ERROR = stripe.StripeError("Session creation failed")
+CANCEL_ERROR = stripe.StripeError("Cancellation failed")
+SIGNATURE_ERROR = stripe.SignatureVerificationError("Invalid signature", "sig_header")
+PAYLOAD_ERROR = ValueError("Invalid payload")
+
+# Attributes every overridden Stripe user starts with
+USER_DEFAULTS = {
+    "id": 1,
+    "email": "test@example.com",
+    "stripe_customer_id": "cus_test123",
+    "stripe_subscription_id": None,
+    "subscription_status": None,
+    "is_subscribed": False,
+    "plan_name": None,
+    "price_amount": None,
+    "price_currency": None,
+    "period_end_ts": None,
+    "cancel_at_period_end": False,
+}
+
+
+@pytest.fixture
+def user_override(monkeypatch):
+    """Override an auth dependency with a User mock built from USER_DEFAULTS"""
+
+    def _apply(dependency=get_user, **attrs):
+        user = Mock(spec=User, **{**USER_DEFAULTS, **attrs})
+        monkeypatch.setitem(app.dependency_overrides, dependency, lambda: user)
+        return user
+
+    return _apply
+
+
+@pytest.fixture
+def admin_token(override_dep):
+    """Authenticate requests with a token carrying the admin claim"""
+    override_dep(get_token, lambda: {"uid": "test-firebase-uid", "admin": True})
+
+
+@pytest.fixture(autouse=True)
+def stripe_mock(monkeypatch):
+    """Stand in for the Stripe SDK everywhere the app calls it"""
+    mock = MagicMock(
+        StripeError=stripe.StripeError,
+        SignatureVerificationError=stripe.SignatureVerificationError,
+    )
+    monkeypatch.setattr("app.routes.stripe.stripe", mock)
+    monkeypatch.setattr("app.services.stripe_cache.stripe", mock)
+    return mock
 
 
 class TestStripeRoutes:
     """Test suite for Stripe payment integration"""
 
-    @contextmanager
-    def override_get_user(self, mock_user_attrs):
-        """Context manager to temporarily override get_user dependency"""
-        from app.deps.auth import get_user
-        from app.main import app
-
-        def mock_get_user():
-            mock_user = Mock()
-            # Set default attributes
-            default_attrs = {
-                "stripe_subscription_id": None,
-                "subscription_status": None,
-                "is_subscribed": False,
-                "stripe_customer_id": "cus_test123",
-            }
-            default_attrs.update(mock_user_attrs)
-
-            # Configure mock to handle both attribute access and getattr()
-            for key, value in default_attrs.items():
-                setattr(mock_user, key, value)
-
-            return mock_user
-
-        original_override = app.dependency_overrides.get(get_user)
-        app.dependency_overrides[get_user] = mock_get_user
-
-        try:
-            yield
-        finally:
-            if original_override:
-                app.dependency_overrides[get_user] = original_override
-            else:
-                app.dependency_overrides.pop(get_user, None)
-
-    @contextmanager
-    def override_get_subscribed_user(self, mock_user_attrs):
-        """Context manager to temporarily override get_subscribed_user dependency"""
-        from app.deps.auth import get_subscribed_user
-        from app.main import app
-
-        def mock_get_subscribed_user():
-            mock_user = Mock()
-            mock_user.configure_mock(**mock_user_attrs)
-            return mock_user
-
-        original_override = app.dependency_overrides.get(get_subscribed_user)
-        app.dependency_overrides[get_subscribed_user] = mock_get_subscribed_user
-
-        try:
-            yield
-        finally:
-            if original_override:
-                app.dependency_overrides[get_subscribed_user] = original_override
-            mock_user = Mock()
-            mock_user.configure_mock(**mock_user_attrs)
-            return mock_user
-
-        original_override = app.dependency_overrides.get(get_user)
-        app.dependency_overrides[get_user] = mock_get_user
-
-        try:
-            yield
-        finally:
-            if original_override:
-                app.dependency_overrides[get_user] = original_override
-
-    def test_get_subscription_status_no_subscription(self, client):
+    def test_get_subscription_status_no_subscription(self, client, user_override):
         """Test subscription status for user without subscription"""
-        with self.override_get_user(
-            {"stripe_subscription_id": None, "subscription_status": None}
-        ):
-            response = client.get("/api/stripe/subscription-status")
-            assert response.status_code == 200
-            data = response.json()
-            assert data["is_subscribed"] is False
-            assert data["status"] == "none"
-            assert data["period_end_date"] is None
+        user_override(stripe_subscription_id=None, subscription_status=None)
+        response = client.get("/api/stripe/subscription-status")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["is_subscribed"] is False
+        assert data["status"] == "none"
+        assert data["period_end_date"] is None
 
-    def test_get_subscription_status_lifetime(self, client):
+    def test_get_subscription_status_lifetime(self, client, user_override):
         """Test subscription status for user with lifetime subscription"""
-        with self.override_get_user(
-            {"stripe_subscription_id": None, "subscription_status": "lifetime"}
-        ):
-            response = client.get("/api/stripe/subscription-status")
-            assert response.status_code == 200
-            data = response.json()
-            assert data["is_subscribed"] is True
-            assert data["status"] == "lifetime"
-            assert data["plan_name"] == "Lifetime Access"
-            assert data["price_amount"] == 29.99
-
-    @patch("stripe.Subscription.retrieve")
-    def test_get_subscription_status_active(self, mock_retrieve, client):
-        """Test subscription status for user with active Stripe subscription"""
-        # Mock Stripe subscription response
-        mock_subscription = {
+        user_override(stripe_subscription_id=None, subscription_status="lifetime")
+        response = client.get("/api/stripe/subscription-status")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["is_subscribed"] is True
+        assert data["status"] == "lifetime"
+        assert data["plan_name"] == "Lifetime Access"
+        assert data["price_amount"] == 29.99
+
+    def test_get_subscription_status_active(self, stripe_mock, client, user_override):
+        """Test subscription status is served from the stored subscription details"""
+        user_override(
+            stripe_subscription_id="sub_123",
+            subscription_status="active",
+            plan_name="Monthly Plan",
+            price_amount=9.99,
+            price_currency="USD",
+            period_end_ts=1640995200,  # Jan 1, 2022
+            cancel_at_period_end=False,
+        )
+        response = client.get("/api/stripe/subscription-status")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["is_subscribed"] is True
+        assert data["status"] == "active"
+        assert data["plan_name"] == "Monthly Plan"
+        assert data["price_amount"] == 9.99
+        assert data["price_currency"] == "USD"
+        assert data["period_end_date"] == "Jan 01, 2022"
+        stripe_mock.Subscription.retrieve.assert_not_called()
+
+    def test_get_subscription_status_does_not_call_stripe(
+        self, stripe_mock, client, user_override
+    ):
+        """Test details not yet stored are left to the backfill instead of Stripe"""
+        user_override(stripe_subscription_id="sub_123", subscription_status="active")
+        response = client.get("/api/stripe/subscription-status")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["is_subscribed"] is True
+        assert data["status"] == "active"
+        assert data["plan_name"] is None
+        assert data["price_amount"] is None
+        stripe_mock.Subscription.retrieve.assert_not_called()
+        stripe_mock.Price.retrieve.assert_not_called()
+
+    def test_refresh_subscription(
+        self, stripe_mock, seeded_client, db_session, admin_token
+    ):
+        """Test an admin refreshing a user's stored details from Stripe"""
+        user = db_session.get(User, 1)
+        user.stripe_subscription_id = "sub_123"
+        user.plan_name = "Old Plan"
+        db_session.commit()
+
+        _subscription_cache["sub_123"] = {"status": "stale"}
+        stripe_mock.Subscription.retrieve.return_value = {
             "status": "active",
-            "cancel_at_period_end": False,
+            "cancel_at_period_end": True,
             "items": {
-                "data": [
-                    {
-                        "current_period_end": 1640995200,  # Jan 1, 2022
-                        "price": {
-                            "unit_amount": 999,  # $9.99 in cents
-                            "currency": "usd",
-                            "product": {"name": "Monthly Plan"},
-                        },
-                    }
-                ]
+                "data": [{"current_period_end": 1640995200, "price": {"id": "p_1"}}]
             },
         }
-        mock_retrieve.return_value = mock_subscription
+        stripe_mock.Price.retrieve.return_value = {
+            "unit_amount": 499,
+            "currency": "usd",
+            "product": {"name": "Monthly Plan"},
+        }
+
+        response = seeded_client.post("/api/stripe/refresh-subscription/1")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "active"
+        assert data["plan_name"] == "Monthly Plan"
+        assert data["price_amount"] == 4.99
+        assert data["cancel_at_period_end"] is True
+        stripe_mock.Subscription.retrieve.assert_called_once_with("sub_123")
+
+    def test_refresh_subscription_no_subscription(self, seeded_client, admin_token):
+        """Test refreshing a user who has no subscription"""
+        response = seeded_client.post("/api/stripe/refresh-subscription/1")
+        assert response.status_code == 400
+        assert "No subscription" in response.json()["detail"]
+
+    def test_refresh_subscription_unknown_user(self, client, admin_token):
+        """Test refreshing a user who does not exist"""
+        response = client.post("/api/stripe/refresh-subscription/999")
+        assert response.status_code == 404
+
+    def test_refresh_subscription_requires_admin(self, stripe_mock, seeded_client):
+        """Test a regular user cannot force a Stripe refresh"""
+        response = seeded_client.post("/api/stripe/refresh-subscription/1")
+        assert response.status_code == 403
+        stripe_mock.Subscription.retrieve.assert_not_called()
 
-        with self.override_get_user({"stripe_subscription_id": "sub_123"}):
-            response = client.get("/api/stripe/subscription-status")
-            assert response.status_code == 200
-            data = response.json()
-            assert data["is_subscribed"] is True
-            assert data["status"] == "active"
-            assert data["plan_name"] == "Monthly Plan"
-            assert data["price_amount"] == 9.99
-
-    @patch("stripe.Subscription.retrieve")
-    def test_get_subscription_status_stripe_error(self, mock_retrieve, client):
-        """Test subscription status when Stripe API fails"""
-        mock_retrieve.side_effect = stripe.StripeError("API Error")
-
-        with self.override_get_user({"stripe_subscription_id": "sub_123"}):
-            response = client.get("/api/stripe/subscription-status")
-            assert response.status_code == 502
-            assert "API Error" in response.json()["detail"]
-
-    @patch("stripe.Customer.create")
-    @patch("stripe.checkout.Session.create")
     def test_create_checkout_session_new_customer(
-        self, mock_session_create, mock_customer_create, client
+        self, stripe_mock, client, user_override
     ):
         """Test creating checkout session for new customer"""
         # Mock Stripe responses
-        mock_customer_create.return_value = Mock(id="cus_123")
-        mock_session_create.return_value = Mock(
+        stripe_mock.Customer.create.return_value = Mock(id="cus_123")
+        stripe_mock.checkout.Session.create.return_value = Mock(
             url="https://checkout.stripe.com/pay/session_123"
         )
 
-        with self.override_get_user(
-            {"stripe_customer_id": None, "email": "test@example.com"}
-        ):
-            response = client.post(
-                "/api/stripe/create-checkout-session",
-                json={
-                    "price_id": "price_123",
-                    "mode": "subscription",
-                    "success_url": "https://example.com/success",
-                    "cancel_url": "https://example.com/cancel",
-                },
-            )
+        user_override(stripe_customer_id=None, email="test@example.com")
+        response = client.post(
+            "/api/stripe/create-checkout-session",
+            json={
+                "price_id": "price_123",
+                "mode": "subscription",
+                "success_url": "https://example.com/success",
+                "cancel_url": "https://example.com/cancel",
+            },
+        )
 
-            assert response.status_code == 200
-            data = response.json()
-            assert data["url"] == "https://checkout.stripe.com/pay/session_123"
-            mock_customer_create.assert_called_once()
+        assert response.status_code == 200
+        data = response.json()
+        assert data["url"] == "https://checkout.stripe.com/pay/session_123"
+        stripe_mock.Customer.create.assert_called_once()
 
-    @patch("stripe.checkout.Session.create")
     def test_create_checkout_session_existing_customer(
-        self, mock_session_create, client
+        self, stripe_mock, client, user_override
     ):
         """Test creating checkout session for existing customer"""
-        mock_session_create.return_value = Mock(
+        stripe_mock.checkout.Session.create.return_value = Mock(
             url="https://checkout.stripe.com/pay/session_123"
         )
 
-        with self.override_get_user(
-            {"stripe_customer_id": "cus_123", "email": "test@example.com"}
-        ):
-            response = client.post(
-                "/api/stripe/create-checkout-session",
-                json={
-                    "price_id": "price_123",
-                    "mode": "payment",
-                    "success_url": "https://example.com/success",
-                    "cancel_url": "https://example.com/cancel",
-                },
-            )
+        user_override(stripe_customer_id="cus_123", email="test@example.com")
+        response = client.post(
+            "/api/stripe/create-checkout-session",
+            json={
+                "price_id": "price_123",
+                "mode": "payment",
+                "success_url": "https://example.com/success",
+                "cancel_url": "https://example.com/cancel",
+            },
+        )
 
-            assert response.status_code == 200
-            data = response.json()
-            assert data["url"] == "https://checkout.stripe.com/pay/session_123"
+        assert response.status_code == 200
+        data = response.json()
+        assert data["url"] == "https://checkout.stripe.com/pay/session_123"
 
-    @patch("stripe.Customer.create")
     def test_create_checkout_session_stripe_customer_error(
-        self, mock_customer_create, client
+        self, stripe_mock, client, user_override
     ):
         """Test checkout session creation when Stripe customer creation fails"""
-        mock_customer_create.side_effect = stripe.StripeError(
-            "Customer creation failed"
+        stripe_mock.Customer.create.side_effect = CUSTOMER_ERROR
+
+        user_override(stripe_customer_id=None, email="test@example.com")
+        response = client.post(
+            "/api/stripe/create-checkout-session",
+            json={
+                "price_id": "price_123",
+                "mode": "subscription",
+                "success_url": "https://example.com/success",
+                "cancel_url": "https://example.com/cancel",
+            },
         )
 
-        with self.override_get_user(
-            {"stripe_customer_id": None, "email": "test@example.com"}
-        ):
-            response = client.post(
-                "/api/stripe/create-checkout-session",
-                json={
-                    "price_id": "price_123",
-                    "mode": "subscription",
-                    "success_url": "https://example.com/success",
-                    "cancel_url": "https://example.com/cancel",
-                },
-            )
-
-            assert response.status_code == 502
-            assert "Customer creation failed" in response.json()["detail"]
+        assert response.status_code == 502
+        assert "Customer creation failed" in response.json()["detail"]
 
-    @patch("stripe.checkout.Session.create")
     def test_create_checkout_session_stripe_session_error(
-        self, mock_session_create, client
+        self, stripe_mock, client, user_override
     ):
         """Test checkout session creation when Stripe session creation fails"""
-        mock_session_create.side_effect = stripe.StripeError("Session creation failed")
-
-        with self.override_get_user(
-            {"stripe_customer_id": "cus_123", "email": "test@example.com"}
-        ):
-            response = client.post(
-                "/api/stripe/create-checkout-session",
-                json={
-                    "price_id": "price_123",
-                    "mode": "subscription",
-                    "success_url": "https://example.com/success",
-                    "cancel_url": "https://example.com/cancel",
-                },
-            )
+        stripe_mock.checkout.Session.create.side_effect = SESSION_ERROR
+
+        user_override(stripe_customer_id="cus_123", email="test@example.com")
+        response = client.post(
+            "/api/stripe/create-checkout-session",
+            json={
+                "price_id": "price_123",
+                "mode": "subscription",
+                "success_url": "https://example.com/success",
+                "cancel_url": "https://example.com/cancel",
+            },
+        )
 
-            assert response.status_code == 502
-            assert "Session creation failed" in response.json()["detail"]
+        assert response.status_code == 502
+        assert "Session creation failed" in response.json()["detail"]
 
-    @patch("stripe.Subscription.modify")
-    def test_cancel_subscription_success(self, mock_modify, client):
+    def test_cancel_subscription_success(self, stripe_mock, client, user_override):
         """Test successful subscription cancellation"""
-        mock_modify.return_value = Mock()
-
-        with self.override_get_subscribed_user({"stripe_subscription_id": "sub_123"}):
-            response = client.post("/api/stripe/cancel-subscription")
-            assert response.status_code == 200
-            data = response.json()
-            assert "canceled" in data["message"]
-            mock_modify.assert_called_once_with("sub_123", cancel_at_period_end=True)
+        stripe_mock.Subscription.modify.return_value = Mock()
+
+        user_override(get_subscribed_user, stripe_subscription_id="sub_123")
+        response = client.post("/api/stripe/cancel-subscription")
+        assert response.status_code == 204
+        assert response.content == b""
+        stripe_mock.Subscription.modify.assert_called_once_with(
+            "sub_123", cancel_at_period_end=True
+        )
 
-    def test_cancel_subscription_no_subscription(self, seeded_client):
+    def test_cancel_subscription_no_subscription(self, user_override, client):
         """Test cancellation when user has no subscription"""
-        with patch("app.routes.stripe.get_subscribed_user") as mock_get_user:
-            mock_user = Mock()
-            mock_user.configure_mock(**{"stripe_subscription_id": None})
-            mock_get_user.return_value = mock_user
+        user_override(get_subscribed_user)
 
-            response = seeded_client.post("/api/stripe/cancel-subscription")
-            assert response.status_code == 400
-            assert "No active subscription" in response.json()["detail"]
+        response = client.post("/api/stripe/cancel-subscription")
+        assert response.status_code == 400
+        assert "No active subscription" in response.json()["detail"]
 
-    @patch("stripe.Subscription.modify")
-    def test_cancel_subscription_stripe_error(self, mock_modify, client):
+    def test_cancel_subscription_stripe_error(self, stripe_mock, client, user_override):
         """Test subscription cancellation when Stripe API fails"""
-        mock_modify.side_effect = stripe.StripeError("Cancellation failed")
-
-        with self.override_get_subscribed_user({"stripe_subscription_id": "sub_123"}):
-            response = client.post("/api/stripe/cancel-subscription")
-            assert response.status_code == 502
-            assert "Cancellation failed" in response.json()["detail"]
-
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_checkout_completed_subscription(
-        self, mock_construct_event, seeded_client
-    ):
-        """Test webhook handling for completed subscription checkout"""
-        mock_event = {
-            "type": "checkout.session.completed",
-            "data": {
-                "object": {
+        stripe_mock.Subscription.modify.side_effect = CANCEL_ERROR
+
+        user_override(get_subscribed_user, stripe_subscription_id="sub_123")
+        response = client.post("/api/stripe/cancel-subscription")
+        assert response.status_code == 502
+        assert "Cancellation failed" in response.json()["detail"]
+
+    @pytest.mark.parametrize(
+        "event_type, event_object",
+        [
+            (
+                "checkout.session.completed",
+                {
                     "customer": "cus_123",
                     "subscription": "sub_123",
                     "mode": "subscription",
-                }
-            },
-        }
-        mock_construct_event.return_value = mock_event
-
-        # Mock request with proper headers
-        response = seeded_client.post(
-            "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "test_sig"},
-        )
-
-        assert response.status_code == 200
-        assert response.json() == {"received": True}
-
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_checkout_completed_payment(
-        self, mock_construct_event, seeded_client
+                },
+            ),
+            ("checkout.session.completed", {"customer": "cus_123", "mode": "payment"}),
+            (
+                "customer.subscription.updated",
+                {"id": "sub_123", "customer": "cus_123", "status": "active"},
+            ),
+            ("customer.subscription.deleted", {"id": "sub_123", "customer": "cus_123"}),
+            ("invoice.payment_failed", {"customer": "cus_123"}),
+            ("invoice.paid", {"customer": "cus_123"}),
+            ("unknown.event.type", {"customer": "cus_unknown"}),
+        ],
+    )
+    def test_stripe_webhook_event(
+        self, stripe_mock, seeded_client, event_type, event_object
     ):
-        """Test webhook handling for completed one-time payment"""
-        mock_event = {
-            "type": "checkout.session.completed",
-            "data": {"object": {"customer": "cus_123", "mode": "payment"}},
+        """Test webhook handling acknowledges each supported event type"""
+        stripe_mock.Webhook.construct_event.return_value = {
+            "type": event_type,
+            "data": {"object": event_object},
         }
-        mock_construct_event.return_value = mock_event
 
         response = seeded_client.post(
-            "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "test_sig"},
+            "/api/stripe/webhook", content=WEBHOOK_BODY, headers=WEBHOOK_HEADERS
         )
 
         assert response.status_code == 200
         assert response.json() == {"received": True}
 
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_invalid_signature(
-        self, mock_construct_event, seeded_client
-    ):
-        """Test webhook handling with invalid signature"""
-        mock_construct_event.side_effect = stripe.SignatureVerificationError(
-            "Invalid signature", "sig_header"
-        )
+    @pytest.mark.parametrize(
+        "error", [PAYLOAD_ERROR, SIGNATURE_ERROR], ids=["payload", "signature"]
+    )
+    def test_stripe_webhook_rejects_unverified_event(self, stripe_mock, client, error):
+        """Test webhook handling when the payload or signature fails verification"""
+        stripe_mock.Webhook.construct_event.side_effect = error
 
-        response = seeded_client.post(
-            "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "invalid_sig"},
+        response = client.post(
+            "/api/stripe/webhook", content=WEBHOOK_BODY, headers=WEBHOOK_HEADERS
         )
 
         assert response.status_code == 400
-        assert response.json()["detail"] == "Invalid signature"
+        assert response.json()["detail"] == "Invalid payload or signature"
 
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_subscription_updated(
-        self, mock_construct_event, seeded_client
+    def test_stripe_webhook_invalidates_cached_subscription(
+        self, stripe_mock, seeded_client
     ):
-        """Test webhook handling for subscription updates"""
-        mock_event = {
+        """Test webhook subscription events drop the cached subscription"""
+        _subscription_cache["sub_123"] = {"status": "active"}
+        stripe_mock.Webhook.construct_event.return_value = {
             "type": "customer.subscription.updated",
             "data": {
-                "object": {"id": "sub_123", "customer": "cus_123", "status": "active"}
+                "object": {"id": "sub_123", "customer": "cus_123", "status": "past_due"}
             },
         }
-        mock_construct_event.return_value = mock_event
 
         response = seeded_client.post(
             "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "test_sig"},
+            content=WEBHOOK_BODY,
+            headers=WEBHOOK_HEADERS,
         )
 
         assert response.status_code == 200
-        assert response.json() == {"received": True}
+        assert "sub_123" not in _subscription_cache
 
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_subscription_deleted(
-        self, mock_construct_event, seeded_client
+    def test_stripe_webhook_processes_event_in_background(
+        self, stripe_mock, seeded_client, db_session
     ):
-        """Test webhook handling for subscription deletion"""
-        mock_event = {
-            "type": "customer.subscription.deleted",
-            "data": {"object": {"id": "sub_123", "customer": "cus_123"}},
+        """Test the queued webhook event updates the linked user"""
+        user = db_session.get(User, 1)
+        user.stripe_customer_id = "cus_123"
+        db_session.commit()
+
+        stripe_mock.Webhook.construct_event.return_value = {
+            "type": "invoice.payment_failed",
+            "data": {"object": {"customer": "cus_123"}},
         }
-        mock_construct_event.return_value = mock_event
 
         response = seeded_client.post(
             "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "test_sig"},
+            content=WEBHOOK_BODY,
+            headers=WEBHOOK_HEADERS,
         )
 
         assert response.status_code == 200
-        assert response.json() == {"received": True}
+        db_session.refresh(user)
+        assert user.is_subscribed is False
+        assert user.subscription_status == "past_due"
 
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_payment_failed(self, mock_construct_event, seeded_client):
-        """Test webhook handling for payment failures"""
-        mock_event = {
-            "type": "invoice.payment_failed",
-            "data": {"object": {"customer": "cus_123"}},
+    def test_stripe_webhook_stores_price_without_unit_amount(
+        self, stripe_mock, seeded_client, db_session
+    ):
+        """Test a metered price leaves the amount empty instead of failing"""
+        user = db_session.get(User, 1)
+        user.stripe_customer_id = "cus_123"
+        db_session.commit()
+
+        stripe_mock.Price.retrieve.return_value = {
+            "unit_amount": None,
+            "currency": "usd",
+            "product": {"name": "Metered Plan"},
+        }
+        stripe_mock.Webhook.construct_event.return_value = {
+            "type": "customer.subscription.updated",
+            "data": {
+                "object": {
+                    "id": "sub_123",
+                    "customer": "cus_123",
+                    "status": "active",
+                    "items": {"data": [{"price": {"id": "price_metered"}}]},
+                }
+            },
         }
-        mock_construct_event.return_value = mock_event
 
         response = seeded_client.post(
-            "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "test_sig"},
+            "/api/stripe/webhook", content=WEBHOOK_BODY, headers=WEBHOOK_HEADERS
         )
 
         assert response.status_code == 200
-        assert response.json() == {"received": True}
+        db_session.refresh(user)
+        assert user.subscription_status == "active"
+        assert user.plan_name == "Metered Plan"
+        assert user.price_amount is None
+        assert user.price_currency == "USD"
+
+    def test_stripe_webhook_commits_status_when_details_sync_fails(
+        self, stripe_mock, seeded_client, db_session
+    ):
+        """Test an unexpected details error still stores the subscription status"""
+        user = db_session.get(User, 1)
+        user.stripe_customer_id = "cus_123"
+        db_session.commit()
 
-    def test_stripe_webhook_invalid_payload(self, seeded_client):
-        """Test webhook handling with invalid payload"""
-        response = seeded_client.post(
-            "/api/stripe/webhook",
-            content="invalid json",  # Use content instead of data
-            headers={
-                "stripe-signature": "test_sig",
-                "content-type": "application/json",
+        stripe_mock.Price.retrieve.side_effect = RuntimeError("unexpected")
+        stripe_mock.Webhook.construct_event.return_value = {
+            "type": "customer.subscription.updated",
+            "data": {
+                "object": {
+                    "id": "sub_123",
+                    "customer": "cus_123",
+                    "status": "past_due",
+                    "items": {"data": [{"price": {"id": "price_123"}}]},
+                }
             },
-        )
+        }
 
-        assert response.status_code == 400
-        assert response.json()["detail"] == "Invalid signature"  # Signature fails first
+        response = seeded_client.post(
+            "/api/stripe/webhook", content=WEBHOOK_BODY, headers=WEBHOOK_HEADERS
+        )
 
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_invoice_paid(self, mock_construct_event, seeded_client):
-        """Test webhook handling for invoice paid events"""
-        mock_event = {
+        assert response.status_code == 200
+        db_session.refresh(user)
+        assert user.stripe_subscription_id == "sub_123"
+        assert user.subscription_status == "past_due"
+        assert user.is_subscribed is False
+
+    @patch("app.routes.stripe.process_stripe_event")
+    def test_stripe_webhook_skips_duplicate_event(
+        self, mock_process_event, stripe_mock, seeded_client
+    ):
+        """Test a retried webhook event is only processed once"""
+        stripe_mock.Webhook.construct_event.return_value = {
+            "id": "evt_123",
             "type": "invoice.paid",
             "data": {"object": {"customer": "cus_123"}},
         }
-        mock_construct_event.return_value = mock_event
 
-        response = seeded_client.post(
-            "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "test_sig"},
-        )
+        for _ in range(2):
+            response = seeded_client.post(
+                "/api/stripe/webhook",
+                content=WEBHOOK_BODY,
+                headers=WEBHOOK_HEADERS,
+            )
+            assert response.status_code == 200
+            assert response.json() == {"received": True}
 
-        assert response.status_code == 200
-        assert response.json() == {"received": True}
+        mock_process_event.assert_called_once()
 
-    @patch("stripe.Webhook.construct_event")
-    def test_stripe_webhook_unknown_event_type(
-        self, mock_construct_event, seeded_client
+    def test_stripe_webhook_removes_applied_event(
+        self, stripe_mock, seeded_client, db_session
     ):
-        """Test webhook handling for unknown event types"""
-        mock_event = {
-            "type": "unknown.event.type",
-            "data": {"object": {"customer": "cus_unknown"}},
+        """Test a stored webhook event is deleted once it has been applied"""
+        stripe_mock.Webhook.construct_event.return_value = {
+            "id": "evt_123",
+            "type": "invoice.paid",
+            "data": {"object": {"customer": "cus_123"}},
         }
-        mock_construct_event.return_value = mock_event
 
         response = seeded_client.post(
             "/api/stripe/webhook",
-            json={"test": "data"},
-            headers={"stripe-signature": "test_sig"},
+            content=WEBHOOK_BODY,
+            headers=WEBHOOK_HEADERS,
         )
 
         assert response.status_code == 200
-        assert response.json() == {"received": True}
+        assert db_session.get(StripeEvent, "evt_123") is None
 
-    @patch("app.routes.stripe.stripe")
-    def test_webhook_invalid_payload(self, mock_stripe, client):
-        """Test webhook with invalid payload"""
-        mock_stripe.Webhook.construct_event.side_effect = ValueError("Invalid payload")
-
-        payload = "invalid-payload"
-        headers = {"stripe-signature": "test-signature"}
-
-        response = client.post("/api/stripe/webhook", data=payload, headers=headers)
+    @patch("app.routes.stripe.apply_stripe_event")
+    def test_stripe_webhook_keeps_failed_event(
+        self, mock_apply_event, stripe_mock, seeded_client, db_session
+    ):
+        """Test an event that fails to apply is left to the retry job, not redelivery"""
+        mock_apply_event.side_effect = RuntimeError("database down")
+        stripe_mock.Webhook.construct_event.return_value = {
+            "id": "evt_123",
+            "type": "invoice.paid",
+            "data": {"object": {"customer": "cus_123"}},
+        }
 
-        assert response.status_code == 400
-        assert response.json()["detail"] == "Invalid payload"
+        # Stripe already got a 200, so a second delivery is only a duplicate
+        for _ in range(2):
+            response = seeded_client.post(
+                "/api/stripe/webhook",
+                content=WEBHOOK_BODY,
+                headers=WEBHOOK_HEADERS,
+            )
+            assert response.status_code == 200
 
-    @patch("app.routes.stripe.stripe")
-    def test_webhook_invalid_signature(self, mock_stripe, client):
-        """Test webhook with invalid signature"""
+        mock_apply_event.assert_called_once()
+        stored = db_session.get(StripeEvent, "evt_123")
+        assert stored.type == "invoice.paid"
+        assert stored.payload == WEBHOOK_BODY.decode()
 
-        # Create a custom exception class that properly inherits from BaseException
-        class MockSignatureVerificationError(Exception):
-            pass
+    @patch("app.routes.stripe.process_stripe_event")
+    @patch("app.routes.stripe.store_stripe_event")
+    def test_stripe_webhook_store_failure(
+        self, mock_store_event, mock_process_event, stripe_mock, client
+    ):
+        """Test the webhook fails when the event cannot be stored"""
+        mock_store_event.side_effect = RuntimeError("database down")
+        stripe_mock.Webhook.construct_event.return_value = {
+            "id": "evt_123",
+            "type": "invoice.paid",
+            "data": {"object": {"customer": "cus_123"}},
+        }
 
-        mock_stripe.Webhook.construct_event.side_effect = (
-            MockSignatureVerificationError("Invalid signature")
+        response = client.post(
+            "/api/stripe/webhook", content=WEBHOOK_BODY, headers=WEBHOOK_HEADERS
         )
-        mock_stripe.SignatureVerificationError = MockSignatureVerificationError
 
-        payload = json.dumps({"type": "test.event"})
-        headers = {"stripe-signature": "invalid-signature"}
+        assert response.status_code == 500
+        mock_process_event.assert_not_called()
 
-        response = client.post("/api/stripe/webhook", data=payload, headers=headers)
+    @patch("app.routes.stripe.process_stripe_event")
+    @patch("app.routes.stripe.store_stripe_event")
+    def test_stripe_webhook_accepts_redelivery_after_store_failure(
+        self, mock_store_event, mock_process_event, stripe_mock, client
+    ):
+        """Test Stripe's redelivery after a 500 is not skipped as a duplicate"""
+        mock_store_event.side_effect = [RuntimeError("database down"), True]
+        stripe_mock.Webhook.construct_event.return_value = {
+            "id": "evt_123",
+            "type": "invoice.paid",
+            "data": {"object": {"customer": "cus_123"}},
+        }
 
-        assert response.status_code == 400
-        assert response.json()["detail"] == "Invalid signature"
+        statuses = [
+            client.post(
+                "/api/stripe/webhook", content=WEBHOOK_BODY, headers=WEBHOOK_HEADERS
+            ).status_code
+            for _ in range(2)
+        ]
+
+        assert statuses == [500, 200]
+        mock_process_event.assert_called_once()
 
-    @patch("app.routes.stripe.stripe")
     def test_webhook_unhandled_event_type_with_unknown_customer(
-        self, mock_stripe, client
+        self, stripe_mock, client, caplog
     ):
         """Test webhook with unhandled event type and unknown customer ID"""
         # Mock Stripe webhook event with unhandled type
@@ -514,15 +591,91 @@ class TestStripeRoutes:
             "type": "some.unhandled.event",
             "data": {"object": {"customer": "cus_unknown123"}},
         }
-        mock_stripe.Webhook.construct_event.return_value = mock_event
-
-        payload = json.dumps(mock_event)
-        headers = {"stripe-signature": "test-signature"}
+        stripe_mock.Webhook.construct_event.return_value = mock_event
 
-        with patch("app.routes.stripe.logger") as mock_logger:
-            response = client.post("/api/stripe/webhook", data=payload, headers=headers)
+        caplog.set_level("WARNING", logger="app.routes.stripe")
+        response = client.post(
+            "/api/stripe/webhook", content=WEBHOOK_BODY, headers=WEBHOOK_HEADERS
+        )
 
-            assert response.status_code == 200
-            assert response.json() == {"received": True}
-            # Verify warning was logged for unknown customer
-            mock_logger.warning.assert_called()
+        assert response.status_code == 200
+        assert response.json() == {"received": True}
+        # Verify warning was logged for unknown customer
+        assert "cus_unknown123 not linked to any user" in caplog.text
+
+
+def test_backfill_subscription_details(stripe_mock, db_session):
+    """Test subscribers without stored details are filled from Stripe once"""
+    db_session.add_all(
+        [
+            User(
+                firebase_uid="uid-missing",
+                email="missing@example.com",
+                stripe_subscription_id="sub_missing",
+            ),
+            User(
+                firebase_uid="uid-stored",
+                email="stored@example.com",
+                stripe_subscription_id="sub_stored",
+                plan_name="Yearly Plan",
+            ),
+            User(firebase_uid="uid-free", email="free@example.com"),
+        ]
+    )
+    db_session.commit()
+
+    stripe_mock.Subscription.retrieve.return_value = {
+        "status": "active",
+        "items": {"data": [{"current_period_end": 1640995200, "price": {"id": "p_1"}}]},
+    }
+    stripe_mock.Price.retrieve.return_value = {
+        "unit_amount": 499,
+        "currency": "usd",
+        "product": {"name": "Monthly Plan"},
+    }
+
+    assert backfill_subscription_details(db_session) == 1
+
+    stripe_mock.Subscription.retrieve.assert_called_once_with("sub_missing")
+    user = db_session.query(User).filter_by(firebase_uid="uid-missing").one()
+    assert user.plan_name == "Monthly Plan"
+    assert user.price_amount == 4.99
+    assert user.period_end_ts == 1640995200
+
+
+def test_retry_stored_events(stripe_mock, seeded_client, db_session):
+    """Test stored events past the first attempt are applied and removed"""
+    user = db_session.get(User, 1)
+    user.stripe_customer_id = "cus_123"
+    user.is_subscribed = False
+    db_session.add_all(
+        [
+            StripeEvent(
+                id="evt_old",
+                type="invoice.paid",
+                payload=json.dumps(
+                    {
+                        "id": "evt_old",
+                        "type": "invoice.paid",
+                        "data": {"object": {"customer": "cus_123"}},
+                    }
+                ),
+                created_at=datetime.utcnow() - timedelta(minutes=10),
+            ),
+            StripeEvent(
+                id="evt_new",
+                type="invoice.paid",
+                payload="{}",
+                created_at=datetime.utcnow(),
+            ),
+        ]
+    )
+    db_session.commit()
+
+    assert retry_stored_events() == 1
+
+    db_session.refresh(user)
+    assert user.is_subscribed is True
+    assert user.subscription_status == "active"
+    assert db_session.get(StripeEvent, "evt_old") is None
+    assert db_session.get(StripeEvent, "evt_new") is not None
@@ -1,17 +1,32 @@
 from datetime import date, timedelta
+from unittest.mock import patch
 
 import pytest
 
+from app.deps.rate_limit import task_write_limiter
+from app.routes.tasks import MAX_BATCH_SIZE
+
+# Dates every test works against, computed once per run
+TODAY = date.today().isoformat()
+TOMORROW = (date.today() + timedelta(days=1)).isoformat()
+YESTERDAY = (date.today() - timedelta(days=1)).isoformat()
+
+
+@pytest.fixture
+def single_task(client):
+    """Create the only task on today's list and return its ID"""
+    res = client.post("/tasks/", json={"date": TODAY, "title": "Only", "note": ""})
+    return res.json()["id"]
+
 
 def test_create_single_task(client):
     """
     Tests creating a single one-time task.
     """
     # Create a task
-    today = date.today().isoformat()  # '2025-04-02'
     res = client.post(
         "/tasks/",
-        json={"date": today, "title": "One-time task", "note": "Test note"},
+        json={"date": TODAY, "title": "One-time task", "note": "Test note"},
     )
 
     # Check response
@@ -26,10 +41,9 @@ def test_create_task_inserts_at_beginning(client):
     Existing tasks for the same date are shifted down (their order is incremented).
     """
     # Create a task for today
-    today = date.today().isoformat()
     res1 = client.post(
         "/tasks/",
-        json={"date": today, "title": "First Task", "note": ""},
+        json={"date": TODAY, "title": "First Task", "note": ""},
     )
 
     # Verify the order of the first task
@@ -40,7 +54,7 @@ def test_create_task_inserts_at_beginning(client):
     # Create a second task for the same date
     res2 = client.post(
         "/tasks/",
-        json={"date": today, "title": "Second Task", "note": ""},
+        json={"date": TODAY, "title": "Second Task", "note": ""},
     )
 
     # Verify the order of the second task
@@ -49,7 +63,7 @@ def test_create_task_inserts_at_beginning(client):
     assert second_task["order"] == 1
 
     # Check that the first task's order has been incremented
-    res = client.get(f"/tasks/?start={today}&end={today}")
+    res = client.get(f"/tasks/?start={TODAY}&end={TODAY}")
     tasks = sorted(res.json(), key=lambda t: t["order"])
     ordered_titles = [t["title"] for t in tasks]
     expected_order = ["Second Task", "First Task"]
@@ -58,16 +72,62 @@ def test_create_task_inserts_at_beginning(client):
     ), f"Expected order {expected_order}, got {ordered_titles}"
 
 
+def test_create_tasks_batch_matches_single_creates(client):
+    """
+    Tests that a batch lands in the same order as creating each task in turn,
+    on top of the tasks already on that day.
+    """
+    client.post("/tasks/", json={"date": TODAY, "title": "Existing", "note": ""})
+
+    res = client.post(
+        "/tasks/batch",
+        json=[
+            {"date": TODAY, "title": "First", "note": ""},
+            {"date": TOMORROW, "title": "Tomorrow", "note": ""},
+            {"date": TODAY, "title": "Second", "note": ""},
+        ],
+    )
+    assert res.status_code == 200
+    created = res.json()
+    assert [t["title"] for t in created] == ["First", "Tomorrow", "Second"]
+    assert [t["order"] for t in created] == [2, 1, 1]
+
+    tasks = client.get(f"/tasks/?start={TODAY}&end={TODAY}").json()
+    assert [t["title"] for t in tasks] == ["Second", "First", "Existing"]
+    assert [t["order"] for t in tasks] == [1, 2, 3]
+
+
+def test_create_tasks_batch_too_large(client):
+    """
+    Tests that a batch longer than the cap is rejected before anything is written.
+    """
+    task = {"date": TODAY, "title": "Task", "note": ""}
+    res = client.post("/tasks/batch", json=[task] * (MAX_BATCH_SIZE + 1))
+    assert res.status_code == 422
+
+    assert client.get(f"/tasks/?start={TODAY}&end={TODAY}").json() == []
+
+
+def test_create_tasks_batch_counts_each_task_against_limit(client):
+    """
+    Tests that every task in a batch is charged to the write limit.
+    """
+    task = {"date": TODAY, "title": "Task", "note": ""}
+    with patch.object(task_write_limiter, "times", 2):
+        res = client.post("/tasks/batch", json=[task] * 3)
+
+    assert res.status_code == 429
+
+
 def test_patch_multiple_update_types_fails(client):
     """
     Tests that mixing update groups (e.g., order and text fields)
     in a single patch request results in a 400 error.
     """
-    today = date.today().isoformat()
     res = client.post(
         "/tasks/",
         json={
-            "date": today,
+            "date": TODAY,
             "title": "Mixed Update",
             "note": "Initial note",
         },
@@ -90,22 +150,18 @@ def test_reorder_task_within_day(client):
     Should shift orders of other tasks correctly.
     """
     # Create 3 tasks on the same day
-    today = date.today().isoformat()
-    for i in range(3):
-        client.post(
-            "/tasks/",
-            json={"date": today, "title": f"Task {i+1}", "note": ""},
-        )
+    res = client.post(
+        "/tasks/batch",
+        json=[{"date": TODAY, "title": f"Task {i+1}", "note": ""} for i in range(3)],
+    )
 
     # Reorder "Task 1" to be first
-    res = client.get(f"/tasks/?start={today}&end={today}")
-    tasks = res.json()
-    task1_id = next(t["id"] for t in tasks if t["title"] == "Task 1")
+    task1_id = res.json()[0]["id"]
     patch = client.patch(f"/tasks/{task1_id}", json={"order": 1})
     assert patch.status_code == 200
 
     # Check the order after reordering
-    updated = client.get(f"/tasks/?start={today}&end={today}").json()
+    updated = client.get(f"/tasks/?start={TODAY}&end={TODAY}").json()
     ordered_titles = [t["title"] for t in sorted(updated, key=lambda x: x["order"])]
     expected_order = ["Task 1", "Task 3", "Task 2"]
     assert (
@@ -119,18 +175,12 @@ def test_update_is_completed_to_incomplete_moves_before_completed(client):
     it is moved to just before the first completed task on the same day.
     """
     # Create 4 tasks on the same day.
-    today = date.today().isoformat()
     titles = ["Task A", "Task B", "Task C", "Task D"]
-    for title in titles:
-        client.post(
-            "/tasks/",
-            json={"date": today, "title": title, "note": ""},
-        )
-
-    # Retrieve tasks and check initial order.
-    res = client.get(f"/tasks/?start={today}&end={today}")
-    tasks = res.json()
-    task_ids = {t["title"]: t["id"] for t in tasks}
+    res = client.post(
+        "/tasks/batch",
+        json=[{"date": TODAY, "title": title, "note": ""} for title in titles],
+    )
+    task_ids = {t["title"]: t["id"] for t in res.json()}
 
     # Mark Task C as complete.
     patch_c = client.patch(f"/tasks/{task_ids['Task C']}", json={"is_completed": True})
@@ -142,7 +192,7 @@ def test_update_is_completed_to_incomplete_moves_before_completed(client):
 
     # After marking complete, expected order becomes:
     # Order 1: Task B, Order 2: Task A, Order 3: Task C, Order 4: Task D.
-    res = client.get(f"/tasks/?start={today}&end={today}")
+    res = client.get(f"/tasks/?start={TODAY}&end={TODAY}")
     tasks = sorted(res.json(), key=lambda t: t["order"])
     orders = {t["title"]: t["order"] for t in tasks}
     assert orders["Task B"] == 1
@@ -159,7 +209,7 @@ def test_update_is_completed_to_incomplete_moves_before_completed(client):
     assert updated_d["is_completed"] is False
 
     # Retrieve tasks and verify new ordering.
-    res = client.get(f"/tasks/?start={today}&end={today}")
+    res = client.get(f"/tasks/?start={TODAY}&end={TODAY}")
     tasks = sorted(res.json(), key=lambda t: t["order"])
     ordered_titles = [t["title"] for t in tasks]
 
@@ -175,52 +225,29 @@ def test_completion_status_route(client):
     Tests that the completion status route returns the correct summary.
     """
     # Define dates
-    day1 = date.today()
-    day2 = day1 + timedelta(days=1)
-    day1_str = day1.isoformat()
-    day2_str = day2.isoformat()
-
-    # Create tasks for Day 1.
-    res = client.post(
-        "/tasks/",
-        json={"date": day1_str, "title": "Task 1", "note": "", "is_completed": True},
-    )
-    assert res.status_code == 200
-
-    res = client.post(
-        "/tasks/",
-        json={"date": day1_str, "title": "Task 2", "note": "", "is_completed": True},
-    )
-    assert res.status_code == 200
 
+    # Create three tasks for Day 1 and two for Day 2.
     res = client.post(
-        "/tasks/",
-        json={"date": day1_str, "title": "Task 3", "note": "", "is_completed": False},
-    )
-    assert res.status_code == 200
-
-    # Create tasks for Day 2.
-    res = client.post(
-        "/tasks/",
-        json={"date": day2_str, "title": "Task 4", "note": "", "is_completed": True},
-    )
-    assert res.status_code == 200
-
-    res = client.post(
-        "/tasks/",
-        json={"date": day2_str, "title": "Task 5", "note": "", "is_completed": False},
+        "/tasks/batch",
+        json=[
+            {"date": TODAY, "title": "Task 1", "note": "", "is_completed": True},
+            {"date": TODAY, "title": "Task 2", "note": "", "is_completed": True},
+            {"date": TODAY, "title": "Task 3", "note": "", "is_completed": False},
+            {"date": TOMORROW, "title": "Task 4", "note": "", "is_completed": True},
+            {"date": TOMORROW, "title": "Task 5", "note": "", "is_completed": False},
+        ],
     )
     assert res.status_code == 200
 
     # Query the /completion/ endpoint for the range covering both days.
-    res = client.get(f"/tasks/completion/?start={day1_str}&end={day2_str}")
+    res = client.get(f"/tasks/completion/?start={TODAY}&end={TOMORROW}")
     assert res.status_code == 200
     data = res.json()
 
     # Expected summaries for each day.
     expected = [
-        {"date": day1_str, "total": 3, "completed": 2},
-        {"date": day2_str, "total": 2, "completed": 1},
+        {"date": TODAY, "total": 3, "completed": 2},
+        {"date": TOMORROW, "total": 2, "completed": 1},
     ]
 
     assert len(data) == len(
@@ -240,40 +267,30 @@ def test_update_task_date_and_reorder(client):
     The task should move to the new date and be inserted at order 1,
     pushing existing tasks on the new date down by 1.
     """
-    today = date.today()
-    today_str = today.isoformat()
-    tomorrow = today + timedelta(days=1)
-    tomorrow_str = tomorrow.isoformat()
 
-    # Create two tasks on today
-    res1 = client.post(
-        "/tasks/", json={"date": today_str, "title": "Task A", "note": ""}
-    )
-    res2 = client.post(
-        "/tasks/", json={"date": today_str, "title": "Task B", "note": ""}
-    )
-    assert res1.status_code == 200 and res2.status_code == 200
-    task_b_id = res2.json()["id"]
-
-    # Create one task on tomorrow
-    res3 = client.post(
-        "/tasks/", json={"date": tomorrow_str, "title": "Task C", "note": ""}
+    # Create two tasks on today and one on tomorrow
+    res = client.post(
+        "/tasks/batch",
+        json=[
+            {"date": TODAY, "title": "Task A", "note": ""},
+            {"date": TODAY, "title": "Task B", "note": ""},
+            {"date": TOMORROW, "title": "Task C", "note": ""},
+        ],
     )
-    assert res3.status_code == 200
+    assert res.status_code == 200
+    task_b_id = res.json()[1]["id"]
 
     # Patch task B's date to tomorrow
-    patch = client.patch(f"/tasks/{task_b_id}", json={"date": tomorrow_str})
-    print("PATCH error details:", patch.json())
-    assert patch.status_code == 200
+    patch = client.patch(f"/tasks/{task_b_id}", json={"date": TOMORROW})
+    assert patch.status_code == 200, patch.json()
     moved = patch.json()
-    assert moved["date"] == tomorrow_str
+    assert moved["date"] == TOMORROW
     assert moved["order"] == 1
 
-    # Fetch tasks on today and tomorrow
-    today_tasks = client.get(f"/tasks/?start={today_str}&end={today_str}").json()
-    tomorrow_tasks = client.get(
-        f"/tasks/?start={tomorrow_str}&end={tomorrow_str}"
-    ).json()
+    # Fetch tasks on today and tomorrow in one request
+    tasks = client.get(f"/tasks/?start={TODAY}&end={TOMORROW}").json()
+    today_tasks = [t for t in tasks if t["date"] == TODAY]
+    tomorrow_tasks = [t for t in tasks if t["date"] == TOMORROW]
 
     # Verify today's tasks are reordered correctly
     assert len(today_tasks) == 1
@@ -293,21 +310,19 @@ def test_get_tasks_within_date_range(client):
     """
     Tests that querying tasks within a specific date range
     """
-    today = date.today()
-    yesterday = today - timedelta(days=1)
-    tomorrow = today + timedelta(days=1)
 
     # Create tasks on three different days
     client.post(
-        "/tasks/", json={"date": yesterday.isoformat(), "title": "Y", "note": ""}
-    )
-    client.post("/tasks/", json={"date": today.isoformat(), "title": "T", "note": ""})
-    client.post(
-        "/tasks/", json={"date": tomorrow.isoformat(), "title": "Tm", "note": ""}
+        "/tasks/batch",
+        json=[
+            {"date": YESTERDAY, "title": "Y", "note": ""},
+            {"date": TODAY, "title": "T", "note": ""},
+            {"date": TOMORROW, "title": "Tm", "note": ""},
+        ],
     )
 
     # Query for today only
-    res = client.get(f"/tasks/?start={today.isoformat()}&end={today.isoformat()}")
+    res = client.get(f"/tasks/?start={TODAY}&end={TODAY}")
     assert res.status_code == 200
     tasks = res.json()
     assert len(tasks) == 1
@@ -318,20 +333,20 @@ def test_delete_task_reorders_remaining(client):
     """
     Tests that deleting a task reorders the remaining tasks correctly.
     """
-    today = date.today().isoformat()
 
     # Create 3 tasks
-    ids = []
-    for title in ["A", "B", "C"]:
-        res = client.post("/tasks/", json={"date": today, "title": title, "note": ""})
-        ids.append(res.json()["id"])
+    res = client.post(
+        "/tasks/batch",
+        json=[{"date": TODAY, "title": title, "note": ""} for title in ["A", "B", "C"]],
+    )
+    ids = [t["id"] for t in res.json()]
 
     # Delete task B (originally order 2)
     res = client.delete(f"/tasks/{ids[1]}")
-    assert res.status_code == 200
+    assert res.status_code == 204
 
     # Verify new order is [C, A]
-    res = client.get(f"/tasks/?start={today}&end={today}")
+    res = client.get(f"/tasks/?start={TODAY}&end={TODAY}")
     ordered = sorted(res.json(), key=lambda t: t["order"])
     assert [t["title"] for t in ordered] == ["C", "A"]
     assert [t["order"] for t in ordered] == [1, 2]
@@ -341,9 +356,8 @@ def test_patch_task_title_and_note_only(client):
     """
     Tests that updating only the title and note of a task works correctly.
     """
-    today = date.today().isoformat()
     res = client.post(
-        "/tasks/", json={"date": today, "title": "Old", "note": "Old note"}
+        "/tasks/", json={"date": TODAY, "title": "Old", "note": "Old note"}
     )
     task_id = res.json()["id"]
 
@@ -354,106 +368,58 @@ def test_patch_task_title_and_note_only(client):
     assert data["note"] == "New note"
 
 
-def test_patch_invalid_order(client):
+@pytest.mark.parametrize(
+    "order, status_code, expected",
+    [
+        (5, 200, {"order": 1}),
+        (0, 400, {"detail": "Order must be 1 or greater"}),
+        (-1, 400, {"detail": "Order must be 1 or greater"}),
+    ],
+)
+def test_patch_task_order_validation(client, single_task, order, status_code, expected):
     """
-    Tests that trying to set an invalid order on a task
+    Tests that an order past the end is clamped and one below 1 is rejected
     """
-    today = date.today().isoformat()
-    res = client.post("/tasks/", json={"date": today, "title": "Only", "note": ""})
-    task_id = res.json()["id"]
-
-    patch = client.patch(f"/tasks/{task_id}", json={"order": 5})
-    assert patch.status_code == 200
-    assert patch.json()["order"] == 1
+    patch = client.patch(f"/tasks/{single_task}", json={"order": order})
+    assert patch.status_code == status_code
+    assert patch.json().items() >= expected.items()
 
 
 def test_patch_task_with_empty_update_data(client):
     """Test patching a task with empty update data (exclude_unset=True coverage)"""
-    today = date.today().isoformat()
 
     # Create a task
     res = client.post(
         "/tasks/",
         json={
-            "date": today,
+            "date": TODAY,
             "title": "Test Task",
             "note": "Test note",
             "is_completed": False,
         },
     )
     assert res.status_code == 200
-    task_id = res.json()["id"]
+    created = res.json()
 
-    # Try to patch with completely empty data
-    patch_res = client.patch(f"/tasks/{task_id}", json={})
+    # Patching with completely empty data returns the task unchanged
+    patch_res = client.patch(f"/tasks/{created['id']}", json={})
     assert patch_res.status_code == 200
-    # Should return unchanged task
-
-
-def test_patch_task_order_validation_zero(client):
-    """Test order validation - order less than 1 should raise error"""
-    today = date.today().isoformat()
-
-    # Create a task
-    res = client.post(
-        "/tasks/",
-        json={
-            "date": today,
-            "title": "Test Task",
-            "note": "Test note",
-            "is_completed": False,
-        },
-    )
-    assert res.status_code == 200
-    task_id = res.json()["id"]
-
-    # Try to set order to 0 (invalid)
-    patch_res = client.patch(f"/tasks/{task_id}", json={"order": 0})
-    assert patch_res.status_code == 400
-    assert "Order must be 1 or greater" in patch_res.json()["detail"]
-
-
-def test_patch_task_order_validation_negative(client):
-    """Test order validation - negative order should raise error"""
-    today = date.today().isoformat()
-
-    # Create a task
-    res = client.post(
-        "/tasks/",
-        json={
-            "date": today,
-            "title": "Test Task",
-            "note": "Test note",
-            "is_completed": False,
-        },
-    )
-    assert res.status_code == 200
-    task_id = res.json()["id"]
-
-    # Try to set order to negative value (invalid)
-    patch_res = client.patch(f"/tasks/{task_id}", json={"order": -1})
-    assert patch_res.status_code == 400
-    assert "Order must be 1 or greater" in patch_res.json()["detail"]
+    assert patch_res.json() == created
 
 
 def test_patch_task_reorder_coverage(client):
     """Test reordering tasks to cover the shift logic branches"""
-    today = date.today().isoformat()
 
     # Create 3 tasks to test reordering
-    task_ids = []
-    for i in range(1, 4):
-        res = client.post(
-            "/tasks/",
-            json={
-                "date": today,
-                "title": f"Task {i}",
-                "note": "",
-                "is_completed": False,
-            },
-        )
-        assert res.status_code == 200
-        task_ids.append(res.json()["id"])
+    res = client.post(
+        "/tasks/batch",
+        json=[
+            {"date": TODAY, "title": f"Task {i}", "note": "", "is_completed": False}
+            for i in range(1, 4)
+        ],
+    )
+    assert res.status_code == 200
+    task_ids = [t["id"] for t in res.json()]
 
     # Test reordering to trigger both shift scenarios
     # This will cover the missing lines in the reorder logic
@@ -469,22 +435,17 @@ def test_patch_task_reorder_coverage(client):
 
 def test_patch_task_reorder_shift_up_specific(client):
     """Test task reordering that specifically triggers the shift up scenario"""
-    today = date.today().isoformat()
 
     # Create 4 tasks to have enough to test reordering
-    task_ids = []
-    for i in range(1, 5):
-        res = client.post(
-            "/tasks/",
-            json={
-                "date": today,
-                "title": f"Task {i}",
-                "note": "",
-                "is_completed": False,
-            },
-        )
-        assert res.status_code == 200
-        task_ids.append(res.json()["id"])
+    res = client.post(
+        "/tasks/batch",
+        json=[
+            {"date": TODAY, "title": f"Task {i}", "note": "", "is_completed": False}
+            for i in range(1, 5)
+        ],
+    )
+    assert res.status_code == 200
+    task_ids = [t["id"] for t in res.json()]
 
     # Move task 4 (currently at order 4) to order 2
     # This should trigger the shift up scenario: new_order <= t_order < current_order
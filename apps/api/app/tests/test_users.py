@@ -7,6 +7,8 @@ from unittest.mock import Mock, patch
 import pytest
 from fastapi import HTTPException
 
+from app.deps.auth import get_token
+from app.main import app
 from app.models.user import User
 
 
@@ -51,10 +53,8 @@ class TestUserRoutes:
         assert data["firebase_uid"] == "test-firebase-uid"
         assert data["email"] == "test@example.com"
 
-    def test_get_current_user_create_new(self, client):
+    def test_get_current_user_create_new(self, client, override_dep):
         """Test creating new user when user doesn't exist"""
-        from app.deps.auth import get_token
-        from app.main import app
 
         # Override with a different token that will create a new user
         def mock_get_token():
@@ -65,21 +65,15 @@ class TestUserRoutes:
             }
 
         # Temporarily override the dependency
-        original_override = app.dependency_overrides.get(get_token)
-        app.dependency_overrides[get_token] = mock_get_token
-
-        try:
-            response = client.get("/users/get_current")
-            assert response.status_code == 200
+        override_dep(get_token, mock_get_token)
+        response = client.get("/users/get_current")
+        assert response.status_code == 200
 
-            data = response.json()
-            assert data["firebase_uid"] == "new-user-12345"
-            assert data["email"] == "newuser@example.com"
-            assert data["name"] == "New User"
-            assert data["is_subscribed"] is False
-        finally:
-            # Always reset to None to avoid contamination
-            app.dependency_overrides.pop(get_token, None)
+        data = response.json()
+        assert data["firebase_uid"] == "new-user-12345"
+        assert data["email"] == "newuser@example.com"
+        assert data["name"] == "New User"
+        assert data["is_subscribed"] is False
 
     def test_patch_user_success(self, seeded_client):
         """Test successful user update"""
@@ -124,10 +118,8 @@ class TestUserRoutes:
         response = seeded_client.patch("/users/1", json={})
         assert response.status_code == 422  # No valid fields provided
 
-    def test_get_current_user_create_new_user_debug(self, client):
+    def test_get_current_user_create_new_user_debug(self, client, override_dep):
         """Test creating a new user to trigger debug print statement"""
-        from app.deps.auth import get_token
-        from app.main import app
 
         def mock_get_token():
             return {
@@ -136,27 +128,17 @@ class TestUserRoutes:
                 "email": "debug@test.com",
             }
 
-        app.dependency_overrides[get_token] = mock_get_token
-
-        try:
-            response = client.get("/users/get_current")
-            assert response.status_code == 200
-            user_data = response.json()
-            assert user_data["firebase_uid"] == "test-new-user-debug-12345"
-            assert user_data["name"] == "Debug Test User"
-            assert user_data["email"] == "debug@test.com"
-            assert user_data["is_subscribed"] is False
-        finally:
-            app.dependency_overrides.pop(get_token, None)
+        override_dep(get_token, mock_get_token)
+        response = client.get("/users/get_current")
+        assert response.status_code == 200
+        user_data = response.json()
+        assert user_data["firebase_uid"] == "test-new-user-debug-12345"
+        assert user_data["name"] == "Debug Test User"
+        assert user_data["email"] == "debug@test.com"
+        assert user_data["is_subscribed"] is False
 
-    def test_cleanup_override_branch_coverage(self, client):
+    def test_cleanup_override_branch_coverage(self, client, override_dep, monkeypatch):
         """Test the cleanup logic to cover missing line 68"""
-        from app.deps.auth import get_token
-        from app.main import app
-
-        # Ensure there's no existing override (this tests the elif branch on line 68)
-        if get_token in app.dependency_overrides:
-            del app.dependency_overrides[get_token]
 
         def mock_get_token():
             return {
@@ -165,16 +147,12 @@ class TestUserRoutes:
                 "email": "cleanup@test.com",
             }
 
-        # This will trigger the cleanup logic in the test
-        original_override = app.dependency_overrides.get(get_token)  # Should be None
-        app.dependency_overrides[get_token] = mock_get_token
-
-        try:
-            response = client.get("/users/get_current")
-            assert response.status_code == 200
-        finally:
-            # This cleanup logic covers line 68 (elif branch)
-            if original_override:
-                app.dependency_overrides[get_token] = original_override
-            elif get_token in app.dependency_overrides:
-                del app.dependency_overrides[get_token]
+        # The session-wide get_token override must survive this swap
+        original_override = app.dependency_overrides.get(get_token)
+        override_dep(get_token, mock_get_token)
+        response = client.get("/users/get_current")
+        assert response.status_code == 200
+
+        # Teardown undoes the swap
+        monkeypatch.undo()
+        assert app.dependency_overrides.get(get_token) is original_override
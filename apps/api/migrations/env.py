@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 from sqlalchemy import engine_from_config, pool
 
 from app.core.database import Base
-from app.models import backlog, note, task, user
+from app.models import backlog, note, stripe_event, task, user
 
 load_dotenv()
 
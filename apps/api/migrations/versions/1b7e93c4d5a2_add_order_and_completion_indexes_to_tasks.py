@@ -0,0 +1,52 @@
+"""Add order and completion indexes to tasks
+
+Revision ID: 1b7e93c4d5a2
+Revises: e8b14d27c3f0
+Create Date: 2025-08-07 10:22:47.194630
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "1b7e93c4d5a2"
+down_revision: Union[str, None] = "e8b14d27c3f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Build the indexes without locking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_user_date_order",
+            "tasks",
+            ["user_id", "date", "order"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_tasks_user_date_completed",
+            "tasks",
+            ["user_id", "date", "is_completed"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_user_date_completed",
+            table_name="tasks",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_tasks_user_date_order",
+            table_name="tasks",
+            postgresql_concurrently=True,
+        )
@@ -29,16 +29,19 @@ def upgrade() -> None:
 
     now = datetime.utcnow()
 
+    # One pass over the table fills whichever of the two columns is null
     op.execute(
         users_table.update()
-        .where(users_table.c.trial_start == None)
-        .values(trial_start=now)
-    )
-
-    op.execute(
-        users_table.update()
-        .where(users_table.c.is_subscribed == None)
-        .values(is_subscribed=False)
+        .where(
+            sa.or_(
+                users_table.c.trial_start.is_(None),
+                users_table.c.is_subscribed.is_(None),
+            )
+        )
+        .values(
+            trial_start=sa.func.coalesce(users_table.c.trial_start, now),
+            is_subscribed=sa.func.coalesce(users_table.c.is_subscribed, False),
+        )
     )
 
 
@@ -50,14 +53,20 @@ def downgrade() -> None:
         sa.column("is_subscribed", sa.Boolean()),
     )
 
+    # One pass clears trial_start and resets subscribed users to null
     op.execute(
         users_table.update()
-        .where(users_table.c.trial_start != None)
-        .values(trial_start=None)
-    )
-
-    op.execute(
-        users_table.update()
-        .where(users_table.c.is_subscribed == True)
-        .values(is_subscribed=None)
+        .where(
+            sa.or_(
+                users_table.c.trial_start.is_not(None),
+                users_table.c.is_subscribed.is_(True),
+            )
+        )
+        .values(
+            trial_start=None,
+            is_subscribed=sa.case(
+                (users_table.c.is_subscribed.is_(True), sa.null()),
+                else_=users_table.c.is_subscribed,
+            ),
+        )
     )
@@ -0,0 +1,39 @@
+"""Add partial index on empty notes
+
+Revision ID: 7d2a6f81e4b9
+Revises: 1b7e93c4d5a2
+Create Date: 2025-08-07 14:05:31.826417
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7d2a6f81e4b9"
+down_revision: Union[str, None] = "1b7e93c4d5a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Build the index without locking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_notes_empty",
+            "notes",
+            ["id"],
+            postgresql_where=sa.text("entry = ''"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_notes_empty", table_name="notes", postgresql_concurrently=True
+        )
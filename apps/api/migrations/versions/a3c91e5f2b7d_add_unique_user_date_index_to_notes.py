@@ -0,0 +1,56 @@
+"""Add unique user/date index to notes
+
+Revision ID: a3c91e5f2b7d
+Revises: 4f4ef67e5c32
+Create Date: 2025-08-04 10:12:37.104518
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c91e5f2b7d"
+down_revision: Union[str, None] = "4f4ef67e5c32"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drop duplicate notes for the same user and date, keeping the newest one
+    # with text so an empty duplicate never wins over the user's writing
+    op.execute("""
+        DELETE FROM notes
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, date
+                    ORDER BY (COALESCE(entry, '') <> '') DESC, id DESC
+                ) AS rank
+                FROM notes
+            ) ranked
+            WHERE rank > 1
+        )
+        """)
+
+    # Build the index without locking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_notes_user_date",
+            "notes",
+            ["user_id", "date"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Duplicate notes deleted by the upgrade are gone; only the index is dropped
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_notes_user_date", table_name="notes", postgresql_concurrently=True
+        )
@@ -0,0 +1,42 @@
+"""Add user index to backlogs
+
+Revision ID: c5d82f4e9a16
+Revises: a3c91e5f2b7d
+Create Date: 2025-08-04 11:03:52.618204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d82f4e9a16"
+down_revision: Union[str, None] = "a3c91e5f2b7d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Build the index without locking writes; the tasks indexes come in
+    # 1b7e93c4d5a2
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_backlogs_user_order",
+            "backlogs",
+            ["user_id", "order"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_backlogs_user_order",
+            table_name="backlogs",
+            postgresql_concurrently=True,
+        )
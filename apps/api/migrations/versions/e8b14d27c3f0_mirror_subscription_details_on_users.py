@@ -0,0 +1,38 @@
+"""Mirror subscription details on users
+
+Revision ID: e8b14d27c3f0
+Revises: c5d82f4e9a16
+Create Date: 2025-08-06 16:41:09.372815
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e8b14d27c3f0"
+down_revision: Union[str, None] = "c5d82f4e9a16"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("users", sa.Column("plan_name", sa.String(), nullable=True))
+    op.add_column("users", sa.Column("price_amount", sa.Float(), nullable=True))
+    op.add_column("users", sa.Column("price_currency", sa.String(), nullable=True))
+    op.add_column("users", sa.Column("period_end_ts", sa.Integer(), nullable=True))
+    op.add_column(
+        "users", sa.Column("cancel_at_period_end", sa.Boolean(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "cancel_at_period_end")
+    op.drop_column("users", "period_end_ts")
+    op.drop_column("users", "price_currency")
+    op.drop_column("users", "price_amount")
+    op.drop_column("users", "plan_name")
@@ -0,0 +1,42 @@
+"""Add stripe_events table
+
+Revision ID: f2a6c8d41b93
+Revises: 7d2a6f81e4b9
+Create Date: 2025-08-12 10:18:44.506219
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a6c8d41b93"
+down_revision: Union[str, None] = "7d2a6f81e4b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "stripe_events",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_stripe_events_created_at"),
+        "stripe_events",
+        ["created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_stripe_events_created_at"), table_name="stripe_events")
+    op.drop_table("stripe_events")
@@ -54,12 +54,11 @@ export async function updateTask(
 /**
  * Delete a task or repeatable tasks.
  */
-export async function deleteTask(taskId: number): Promise<{ message: string }> {
+export async function deleteTask(taskId: number): Promise<void> {
   const res = await apiFetch(`${NEXT_PUBLIC_API_URL}/tasks/${taskId}`, {
     method: "DELETE",
   });
   if (!res.ok) throw new Error("Failed to delete task");
-  return res.json();
 }
 
 /**